@@ -1,17 +1,14 @@
-import os
+import argparse
 import datetime
-from neo4j import GraphDatabase
-from dotenv import load_dotenv
+from connections import load_environment, get_neo4j_driver, close_connections
+from topic_trends import period_days, days_to_rebuild, rebuild_daily_buckets, finalize_trends, backfill_trends, format_summary
 
-# Load environment variables
-load_dotenv()
-
-# Neo4j credentials
-NEO4J_URI = os.getenv("NEO4J_URI")
-NEO4J_USER = os.getenv("NEO4J_USERNAME")
-NEO4J_PASS = os.getenv("NEO4J_PASSWORD")
-
-def generate_monthly_trends(driver, year_month_str=None):
+def generate_monthly_trends(driver, year_month_str=None, rebuild=False, workers=1):
+    """
+    Finalize the monthly trends of `year_month_str` (last month by default)
+    by combining its daily buckets. Articles are only rescanned for days the
+    sync did not keep buckets for, or all of them with `rebuild`.
+    """
     # If no year_month provided, use last month
     if year_month_str is None:
         today = datetime.date.today()
@@ -29,70 +26,73 @@ def generate_monthly_trends(driver, year_month_str=None):
     else:
         end_date = datetime.date(start_year, start_month + 1, 1)
 
-    cypher = """
-    MATCH (c:City)<-[:PUBLISHED_IN]-(a:Article)-[rel:HAS_TOPIC]->(i:Issue)
-    WHERE rel.publishDate >= date($startDate)
-      AND rel.publishDate < date($endDate)
-    WITH c, i,
-         count(a) AS mentionCount,
-         avg(a.sentimentScore) AS avgSentiment
-    MERGE (tt:TopicTrend {
-      topicName: i.name,
-      cityName: c.name,
-      yearMonth: $ym
-    })
-    SET tt.mentionCount = mentionCount,
-        tt.averageSentiment = avgSentiment,
-        tt.lastUpdated = datetime()
-    MERGE (c)-[:MONTHLY_TREND]->(tt)
-    MERGE (tt)-[:TREND_OF]->(i)
-    RETURN c.name AS city, i.name AS topic, 
-           mentionCount, avgSentiment
-    """
-
     print(f"Generating monthly trends for {year_month_str}")
     print(f"Date range: {start_date} to {end_date}")
 
-    with driver.session() as session:
-        result = session.run(cypher, {
-            "startDate": str(start_date),
-            "endDate": str(end_date),
-            "ym": year_month_str
-        })
-        
-        trends = []
-        for record in result:
-            trend = {
-                'city': record['city'],
-                'topic': record['topic'],
-                'count': record['mentionCount'],
-                'sentiment': record['avgSentiment']
-            }
-            trends.append(trend)
-            print(f"Updated monthly trend: City={trend['city']}, "
-                  f"Topic={trend['topic']}, Count={trend['count']}, "
-                  f"AvgSent={trend['sentiment']:.2f}")
-        
-        print(f"Updated {len(trends)} topic trends for {year_month_str}")
-        return trends
+    # Days the sync did not cover are rebuilt from their articles, once
+    days = days_to_rebuild(period_days('monthly', year_month_str, start_date, end_date), force=rebuild)
+    if days:
+        print(f"Rebuilding {len(days)} days of daily buckets from their articles")
+        rebuilt = rebuild_daily_buckets(driver, days, workers)
+        print(f"Rebuilt {rebuilt} daily buckets")
+
+    summary = finalize_trends(driver, 'monthly', year_month_str, workers)
+    print(f"Updated {year_month_str}: {format_summary(summary)}")
+    return summary
+
+def backfill_monthly_trends(driver, start_date, end_date, rebuild=False, workers=1):
+    """
+    Finalize every month overlapping [start_date, end_date], rebuilding the
+    daily buckets they need from one pass over their articles.
+    """
+    print(f"Backfilling monthly trends from {start_date} to {end_date}")
+    results = backfill_trends(driver, 'monthly', start_date, end_date + datetime.timedelta(days=1),
+                              rebuild, workers)
+    for period, summary in results:
+        print(f"Updated {period}: {format_summary(summary)}")
+    print(f"Backfilled {len(results)} months")
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Finalize the monthly topic trends')
+    parser.add_argument('--month', help='Month to finalize as YYYY-MM (default: last month)')
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Recompute the daily buckets of the months from their articles first")
+    parser.add_argument('--from', dest='start', type=datetime.date.fromisoformat,
+                        help='Backfill every month from this date (YYYY-MM-DD), with --to')
+    parser.add_argument('--to', dest='end', type=datetime.date.fromisoformat,
+                        help='Last date of the backfill (YYYY-MM-DD, inclusive)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Aggregate groups of cities in parallel on N threads (default: 1)')
+    args = parser.parse_args()
+    if (args.start is None) != (args.end is None):
+        parser.error("--from and --to go together")
+    if args.start is not None and args.end < args.start:
+        parser.error("--to is before --from")
+    if args.start is not None and args.month is not None:
+        parser.error("--month cannot be combined with --from/--to")
+    return args
 
 def main():
+    load_environment()
+    args = parse_args()
     try:
         print("\nStarting monthly trend aggregation...")
-        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASS))
+        driver = get_neo4j_driver()
         
-        # Generate trends for last month
-        generate_monthly_trends(driver)
+        if args.start is not None:
+            backfill_monthly_trends(driver, args.start, args.end, args.rebuild, args.workers)
+        else:
+            # Finalize trends for last month unless another one is given
+            generate_monthly_trends(driver, args.month, args.rebuild, args.workers)
         
-        driver.close()
         print("Monthly trend aggregation completed successfully!")
         
     except Exception as e:
         print(f"Error during monthly trend aggregation: {str(e)}")
         raise
     finally:
-        if 'driver' in locals():
-            driver.close()
+        close_connections()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
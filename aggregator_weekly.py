@@ -1,15 +1,7 @@
-import os
+import argparse
 import datetime
-from neo4j import GraphDatabase
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# Neo4j credentials
-NEO4J_URI = os.getenv("NEO4J_URI")
-NEO4J_USER = os.getenv("NEO4J_USERNAME")
-NEO4J_PASS = os.getenv("NEO4J_PASSWORD")
+from connections import load_environment, get_neo4j_driver, close_connections
+from topic_trends import period_days, days_to_rebuild, rebuild_daily_buckets, finalize_trends, backfill_trends, format_summary
 
 def get_week_dates(year_week=None):
     if year_week is None:
@@ -33,73 +25,81 @@ def get_week_dates(year_week=None):
     
     return last_monday, next_monday, year_week
 
-def generate_weekly_trends(driver, year_week=None):
-    start_date, end_date, year_week = get_week_dates(year_week)
-    
-    cypher = """
-    MATCH (c:City)<-[:PUBLISHED_IN]-(a:Article)-[rel:HAS_TOPIC]->(i:Issue)
-    WHERE rel.publishDate >= date($startDate)
-      AND rel.publishDate < date($endDate)
-    WITH c, i,
-         count(a) AS mentionCount,
-         avg(a.sentimentScore) AS avgSentiment
-    MERGE (tt:TopicTrendWeekly {
-      topicName: i.name,
-      cityName: c.name,
-      yearWeek: $yw
-    })
-    SET tt.mentionCount = mentionCount,
-        tt.averageSentiment = avgSentiment,
-        tt.lastUpdated = datetime()
-    MERGE (c)-[:WEEKLY_TREND]->(tt)
-    MERGE (tt)-[:TREND_OF]->(i)
-    RETURN c.name AS city, i.name AS topic, 
-           mentionCount, avgSentiment
+def generate_weekly_trends(driver, year_week=None, rebuild=False, workers=1):
     """
+    Finalize the weekly trends of `year_week` (last week by default) by
+    combining its daily buckets. Articles are only rescanned for days the
+    sync did not keep buckets for, or all of them with `rebuild`.
+    """
+    start_date, end_date, year_week = get_week_dates(year_week)
 
     print(f"Generating weekly trends for {year_week}")
     print(f"Date range: {start_date} to {end_date}")
 
-    with driver.session() as session:
-        result = session.run(cypher, {
-            "startDate": str(start_date),
-            "endDate": str(end_date),
-            "yw": year_week
-        })
-        
-        trends = []
-        for record in result:
-            trend = {
-                'city': record['city'],
-                'topic': record['topic'],
-                'count': record['mentionCount'],
-                'sentiment': record['avgSentiment']
-            }
-            trends.append(trend)
-            print(f"Updated weekly trend: City={trend['city']}, "
-                  f"Topic={trend['topic']}, Count={trend['count']}, "
-                  f"AvgSent={trend['sentiment']:.2f}")
-        
-        print(f"Updated {len(trends)} topic trends for {year_week}")
-        return trends
+    # Days the sync did not cover are rebuilt from their articles, once
+    days = days_to_rebuild(period_days('weekly', year_week, start_date, end_date), force=rebuild)
+    if days:
+        print(f"Rebuilding {len(days)} days of daily buckets from their articles")
+        rebuilt = rebuild_daily_buckets(driver, days, workers)
+        print(f"Rebuilt {rebuilt} daily buckets")
+
+    summary = finalize_trends(driver, 'weekly', year_week, workers)
+    print(f"Updated {year_week}: {format_summary(summary)}")
+    return summary
+
+def backfill_weekly_trends(driver, start_date, end_date, rebuild=False, workers=1):
+    """
+    Finalize every week overlapping [start_date, end_date], rebuilding the
+    daily buckets they need from one pass over their articles.
+    """
+    print(f"Backfilling weekly trends from {start_date} to {end_date}")
+    results = backfill_trends(driver, 'weekly', start_date, end_date + datetime.timedelta(days=1),
+                              rebuild, workers)
+    for period, summary in results:
+        print(f"Updated {period}: {format_summary(summary)}")
+    print(f"Backfilled {len(results)} weeks")
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Finalize the weekly topic trends')
+    parser.add_argument('--week', help='Week to finalize as YYYY-WXX (default: last week)')
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Recompute the daily buckets of the weeks from their articles first")
+    parser.add_argument('--from', dest='start', type=datetime.date.fromisoformat,
+                        help='Backfill every week from this date (YYYY-MM-DD), with --to')
+    parser.add_argument('--to', dest='end', type=datetime.date.fromisoformat,
+                        help='Last date of the backfill (YYYY-MM-DD, inclusive)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Aggregate groups of cities in parallel on N threads (default: 1)')
+    args = parser.parse_args()
+    if (args.start is None) != (args.end is None):
+        parser.error("--from and --to go together")
+    if args.start is not None and args.end < args.start:
+        parser.error("--to is before --from")
+    if args.start is not None and args.week is not None:
+        parser.error("--week cannot be combined with --from/--to")
+    return args
 
 def main():
+    load_environment()
+    args = parse_args()
     try:
         print("\nStarting weekly trend aggregation...")
-        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASS))
+        driver = get_neo4j_driver()
         
-        # Generate trends for last week
-        generate_weekly_trends(driver)
+        if args.start is not None:
+            backfill_weekly_trends(driver, args.start, args.end, args.rebuild, args.workers)
+        else:
+            # Finalize trends for last week unless another one is given
+            generate_weekly_trends(driver, args.week, args.rebuild, args.workers)
         
-        driver.close()
         print("Weekly trend aggregation completed successfully!")
         
     except Exception as e:
         print(f"Error during weekly trend aggregation: {str(e)}")
         raise
     finally:
-        if 'driver' in locals():
-            driver.close()
+        close_connections()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,262 @@
+import os
+import glob
+import json
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+
+# Local SQLite file holding every sync watermark, CHECKPOINT_DB read when
+# the store is opened
+DEFAULT_CHECKPOINT_DB = "sync_state.db"
+
+class CheckpointStore:
+    """
+    Durable key/value store for sync checkpoints.
+
+    Each `set` is a single SQLite transaction, so a checkpoint is either the
+    old or the new value even if the process dies mid-write. Values are
+    stored as JSON, which keeps integer ids and UUID strings apart. Safe to
+    share between threads.
+    """
+
+    def __init__(self, path=None):
+        path = path or os.getenv("CHECKPOINT_DB", DEFAULT_CHECKPOINT_DB)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS row_hashes (
+                table_name TEXT NOT NULL,
+                row_id TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (table_name, row_id)
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dead_letters (
+                table_name TEXT NOT NULL,
+                row_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                error TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 1,
+                first_failed_at TEXT NOT NULL,
+                last_failed_at TEXT NOT NULL,
+                PRIMARY KEY (table_name, row_id)
+            )
+            """
+        )
+
+    def get(self, name, default=None):
+        """Return the stored value for `name`, or `default` if there is none."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM checkpoints WHERE name = ?", (name,)
+            ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set(self, name, value):
+        """Atomically replace the value for `name`."""
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO checkpoints (name, value, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+                """,
+                (name, json.dumps(value, default=str), datetime.now().isoformat())
+            )
+
+    def delete(self, *names):
+        """Remove checkpoints in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("DELETE FROM checkpoints WHERE name = ?", [(n,) for n in names])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete_prefix(self, prefix):
+        """Remove every checkpoint whose name starts with `prefix`."""
+        pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE name LIKE ? ESCAPE '\\'", (pattern,))
+
+    def get_row_hashes(self, table, row_ids):
+        """Return {row_id: hash} for the rows of `table` that were written before."""
+        row_ids = [str(r) for r in row_ids]
+        hashes = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(row_ids), 500):
+                chunk = row_ids[i:i + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                hashes.update(self._conn.execute(
+                    f"SELECT row_id, hash FROM row_hashes WHERE table_name = ? AND row_id IN ({placeholders})",
+                    [table] + chunk
+                ).fetchall())
+        return hashes
+
+    def set_row_hashes(self, table, hashes):
+        """Record the hashes of rows of `table` just written to Neo4j, in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    """
+                    INSERT INTO row_hashes (table_name, row_id, hash) VALUES (?, ?, ?)
+                    ON CONFLICT(table_name, row_id) DO UPDATE SET hash = excluded.hash
+                    """,
+                    [(table, str(row_id), h) for row_id, h in hashes.items()]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def add_dead_letters(self, table, failures):
+        """
+        Record rows of `table` that could not be synced. `failures` is a list
+        of (row_id, stage, error); a row that failed before has its attempt
+        count bumped and its error replaced.
+        """
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    """
+                    INSERT INTO dead_letters (table_name, row_id, stage, error, first_failed_at, last_failed_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(table_name, row_id) DO UPDATE SET
+                        stage = excluded.stage,
+                        error = excluded.error,
+                        attempts = attempts + 1,
+                        last_failed_at = excluded.last_failed_at
+                    """,
+                    [(table, str(row_id), stage, str(error), now, now) for row_id, stage, error in failures]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get_dead_letters(self, table=None):
+        """Return the dead-lettered rows (of `table`, or all) as dicts, oldest first."""
+        query = ("SELECT table_name, row_id, stage, error, attempts, first_failed_at, last_failed_at "
+                 "FROM dead_letters")
+        params = []
+        if table is not None:
+            query += " WHERE table_name = ?"
+            params.append(table)
+        query += " ORDER BY first_failed_at, table_name, row_id"
+        with self._lock:
+            cursor = self._conn.execute(query, params)
+            names = [d[0] for d in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def remove_dead_letters(self, table, row_ids):
+        """Drop rows of `table` from the dead-letter store, e.g. after a successful replay."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "DELETE FROM dead_letters WHERE table_name = ? AND row_id = ?",
+                    [(table, str(row_id)) for row_id in row_ids]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def migrate_legacy_files(self, directory="."):
+        """
+        Import the old <name>_checkpoint.txt and <name>_partitions.json files
+        as full-sync checkpoints, then rename them so they are not read twice.
+        """
+        for path in glob.glob(os.path.join(directory, "*_checkpoint.txt")):
+            name = os.path.basename(path)[:-len("_checkpoint.txt")]
+            with open(path, 'r') as f:
+                value = f.read().strip()
+            if value:
+                if self.get(f"full:{name}") is None:
+                    self.set(f"full:{name}", int(value) if value.isdigit() else value)
+                    print(f"Migrated checkpoint {path}")
+            os.rename(path, path + ".migrated")
+
+        for path in glob.glob(os.path.join(directory, "*_partitions.json")):
+            name = os.path.basename(path)[:-len("_partitions.json")]
+            with open(path, 'r') as f:
+                plan = json.load(f)
+            if self.get(f"full:{name}:partitions") is None:
+                self.set(f"full:{name}:partitions", plan)
+                print(f"Migrated partition plan {path}")
+            os.rename(path, path + ".migrated")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def row_hash(row):
+    """Stable hash of a row's projected columns."""
+    payload = json.dumps(row, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+class ChangeDetector:
+    """
+    Splits batches into rows that changed since they were last written and
+    rows that did not, using the hashes kept in the checkpoint store.
+
+    Only `columns` are hashed, so the same row hashes the same whichever
+    sync read it. `split` is meant to run as the pipeline transform stage and
+    `record` after the Neo4j transaction for the changed rows has committed.
+    With force=True every row counts as changed.
+    """
+
+    def __init__(self, table, columns, store=None, force=False):
+        self.table = table
+        self.columns = columns
+        self.store = store or get_checkpoint_store()
+        self.force = force
+
+    def split(self, batch):
+        """Return (batch, changed) where changed is a list of (row, hash) to write."""
+        hashes = [(row, row_hash({c: row.get(c) for c in self.columns})) for row in batch]
+        if self.force:
+            return batch, hashes
+        previous = self.store.get_row_hashes(self.table, [row['id'] for row in batch])
+        changed = [(row, h) for row, h in hashes if previous.get(str(row['id'])) != h]
+        return batch, changed
+
+    def record(self, changed, failed=()):
+        """Store the hashes of the written rows; rows in `failed` keep their old hash."""
+        failed_ids = {str(row['id']) for row, _ in failed}
+        self.store.set_row_hashes(self.table, {row['id']: h for row, h in changed
+                                               if str(row['id']) not in failed_ids})
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_checkpoint_store():
+    """Return the process-wide CheckpointStore, opening it (and migrating old files) on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CheckpointStore()
+            _store.migrate_legacy_files()
+        return _store
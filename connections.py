@@ -0,0 +1,175 @@
+import os
+import threading
+from contextlib import contextmanager
+from psycopg2.pool import ThreadedConnectionPool
+from neo4j import GraphDatabase, AsyncGraphDatabase
+from dotenv import load_dotenv
+
+_env_loaded = False
+
+def load_environment():
+    """Load .env into the environment once; each entry point calls this before reading settings."""
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv()
+        _env_loaded = True
+
+def _setting(name, default, cast=str):
+    return cast(os.getenv(name, default))
+
+###################################################
+#                    POSTGRES                      #
+###################################################
+
+def postgres_url():
+    """DATABASE_URL if set, otherwise built from the user/password/host/port/dbname variables."""
+    if os.getenv("DATABASE_URL"):
+        return os.getenv("DATABASE_URL")
+    return f"postgresql://{os.getenv('user')}:{os.getenv('password')}@{os.getenv('host')}:{os.getenv('port')}/{os.getenv('dbname')}"
+
+# Settings (read when the pool is created):
+#   PG_POOL_MIN / PG_POOL_MAX  connections kept open; the sync scripts run no
+#                              more tables and partitions at once than
+#                              PG_POOL_MAX connections can serve
+#   PG_POOL_TIMEOUT            seconds to wait for a free pooled connection
+#   PG_CONNECT_TIMEOUT         seconds to wait for a new connection
+
+def pg_pool_max():
+    """Connections the Postgres pool lends out at once (PG_POOL_MAX)."""
+    load_environment()
+    return _setting("PG_POOL_MAX", "16", int)
+
+_pg_pool = None
+# ThreadedConnectionPool raises when exhausted; this makes callers wait instead
+_pg_slots = None
+_lock = threading.Lock()
+
+def get_pg_pool():
+    """Return the process-wide Postgres connection pool, creating it on first use."""
+    global _pg_pool, _pg_slots
+    with _lock:
+        if _pg_pool is None:
+            pool_max = pg_pool_max()
+            print("\nAttempting to connect to PostgreSQL database...")
+            try:
+                _pg_pool = ThreadedConnectionPool(
+                    _setting("PG_POOL_MIN", "1", int), pool_max, postgres_url(),
+                    connect_timeout=_setting("PG_CONNECT_TIMEOUT", "10", int),
+                    keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=5
+                )
+                _pg_slots = threading.BoundedSemaphore(pool_max)
+                print("PostgreSQL connection successful!")
+            except Exception as e:
+                print(f"Error connecting to PostgreSQL: {str(e)}")
+                raise
+        return _pg_pool
+
+@contextmanager
+def pg_connection():
+    """
+    Borrow a connection from the pool for the duration of the block. It is
+    rolled back and reset to the default session settings (isolation level,
+    read-only) before going back to the pool.
+    """
+    pool = get_pg_pool()
+    slots = _pg_slots
+    timeout = _setting("PG_POOL_TIMEOUT", "300", float)
+    if not slots.acquire(timeout=timeout):
+        raise RuntimeError(f"No Postgres connection free after {timeout}s, raise PG_POOL_MAX")
+    try:
+        conn = pool.getconn()
+        broken = False
+        try:
+            yield conn
+        finally:
+            try:
+                if not conn.closed:
+                    conn.reset()
+            except Exception:
+                broken = True
+            pool.putconn(conn, close=broken or bool(conn.closed))
+    finally:
+        slots.release()
+
+@contextmanager
+def borrowed_connection(pg_conn):
+    """Yield `pg_conn`, or a pooled connection for the block when it is None."""
+    if pg_conn is not None:
+        yield pg_conn
+    else:
+        with pg_connection() as own_conn:
+            yield own_conn
+
+###################################################
+#                      NEO4J                       #
+###################################################
+
+# Driver settings (read when the driver is created), defaults in brackets:
+#   NEO4J_MAX_POOL_SIZE [50]            should cover every concurrent writer
+#   NEO4J_ACQUISITION_TIMEOUT [120]     seconds to wait for a pooled connection
+#   NEO4J_FETCH_SIZE [1000]             records per pull from the server
+#   NEO4J_MAX_CONNECTION_LIFETIME [3600]
+#   NEO4J_MAX_RETRY_TIME [30]           seconds execute_write keeps retrying
+
+def neo4j_driver_settings():
+    """Return (uri, auth, config) shared by the blocking and the async driver."""
+    load_environment()
+    uri = os.getenv("NEO4J_URI")
+    user = os.getenv("NEO4J_USERNAME")
+    print("\nAttempting to connect to Neo4j database...")
+    print(f"URI: {uri}")
+    print(f"Username: {user}")
+    config = {
+        'max_connection_pool_size': _setting("NEO4J_MAX_POOL_SIZE", "50", int),
+        'connection_acquisition_timeout': _setting("NEO4J_ACQUISITION_TIMEOUT", "120", float),
+        'max_connection_lifetime': _setting("NEO4J_MAX_CONNECTION_LIFETIME", "3600", float),
+        'max_transaction_retry_time': _setting("NEO4J_MAX_RETRY_TIME", "30", float),
+        'fetch_size': _setting("NEO4J_FETCH_SIZE", "1000", int),
+        'keep_alive': True,
+    }
+    return uri, (user, os.getenv("NEO4J_PASSWORD")), config
+
+_neo4j_driver = None
+
+def get_neo4j_driver():
+    """Return the process-wide Neo4j driver, creating and verifying it on first use."""
+    global _neo4j_driver
+    with _lock:
+        if _neo4j_driver is None:
+            uri, auth, config = neo4j_driver_settings()
+            try:
+                driver = GraphDatabase.driver(uri, auth=auth, **config)
+                driver.verify_connectivity()
+                print("Neo4j connection successful!")
+            except Exception as e:
+                print(f"Error connecting to Neo4j: {str(e)}")
+                raise
+            _neo4j_driver = driver
+        return _neo4j_driver
+
+def close_connections():
+    """Close the Neo4j driver and every pooled Postgres connection."""
+    global _neo4j_driver, _pg_pool
+    with _lock:
+        if _neo4j_driver is not None:
+            _neo4j_driver.close()
+            _neo4j_driver = None
+        if _pg_pool is not None:
+            _pg_pool.closeall()
+            _pg_pool = None
+
+async def open_async_neo4j_driver():
+    """
+    Create and verify an AsyncGraphDatabase driver with the same settings.
+    It belongs to the running event loop, so the caller closes it.
+    """
+    uri, auth, config = neo4j_driver_settings()
+    driver = AsyncGraphDatabase.driver(uri, auth=auth, **config)
+    try:
+        await driver.verify_connectivity()
+        print("Neo4j connection successful!")
+    except Exception as e:
+        await driver.close()
+        print(f"Error connecting to Neo4j: {str(e)}")
+        raise
+    return driver
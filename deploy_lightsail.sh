@@ -11,7 +11,7 @@ python3 -m venv venv
 source venv/bin/activate
 
 # Install required Python packages
-pip install psycopg2-binary neo4j python-dotenv
+pip install psycopg2-binary neo4j python-dotenv asyncpg
 
 # Create log directory with proper permissions
 mkdir -p ~/knowledgegraph/logs
@@ -21,4 +21,7 @@ chmod 755 ~/knowledgegraph/logs
 chmod +x run_daily_sync.sh
 chmod +x setup_cron.sh
 
+# Create Neo4j constraints and indexes (idempotent)
+python3 schema_setup.py
+
 echo "Environment setup complete! Daily sync has been configured." 
\ No newline at end of file
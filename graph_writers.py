@@ -0,0 +1,1150 @@
+import os
+import json
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict, deque
+from decimal import Decimal
+from neo4j.exceptions import ClientError, AuthError, Forbidden, CypherSyntaxError
+from checkpoint_store import get_checkpoint_store
+from topic_trends import trend_delta, trend_delta_statements
+
+# orjson parses the quotes/entities JSONB text several times faster; optional
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+###################################################
+#                 STATEMENT PLANS                  #
+###################################################
+
+# Each writer below comes in two stages:
+#   prepare_*(rows)               pure transform of a page of source rows into
+#                                 sorted parameter lists (parsed JSON, coerced
+#                                 decimals, flattened lists); runs before the
+#                                 transaction, in the pipeline's transform stage
+#   *_statements(params, dims)    statement plan: a generator that yields
+#                                 (query, params) for every Cypher statement and
+#                                 is sent back the records of each; its return
+#                                 value is passed through
+# The same plan runs in a blocking transaction (run_plan, used by
+# execute_write) or an async one (sync_async.py).
+
+def run_plan(tx, plan):
+    """Run a statement plan in a (blocking) transaction and return its result."""
+    try:
+        query, params = next(plan)
+        while True:
+            records = list(tx.run(query, **params))
+            query, params = plan.send(records)
+    except StopIteration as done:
+        return done.value
+
+def transaction_writer(prepare, statements):
+    """
+    Combine a writer's two stages into a transaction function
+    `fn(tx, rows, dimensions=None)` for execute_write. `fn.prepared(tx,
+    params, dimensions=None)` runs only the statements, for params prepared
+    ahead of time. A fresh plan is started for every attempt, so driver
+    retries are safe.
+    """
+    def write(tx, rows, dimensions=None):
+        return run_plan(tx, statements(prepare_checked(prepare, rows), dimensions))
+
+    def write_prepared(tx, params, dimensions=None):
+        return run_plan(tx, statements(params, dimensions))
+
+    write.prepare = prepare
+    write.statements = statements
+    write.prepared = write_prepared
+    return write
+
+###################################################
+#                 TRANSFORM STAGE                  #
+###################################################
+
+# Settings (read at use):
+#   TRANSFORM_PROCESSES      worker processes for prepare_* on large pages
+#                            (0 = prepare in the calling thread)
+#   TRANSFORM_POOL_MIN_ROWS  pages smaller than this are not worth the
+#                            pickling round trip
+
+_transform_pool = None
+_transform_pool_lock = threading.Lock()
+
+def get_transform_pool():
+    """Return the shared process pool for prepare_*, or None if disabled."""
+    global _transform_pool
+    processes = int(os.getenv("TRANSFORM_PROCESSES", "0"))
+    if processes <= 0:
+        return None
+    with _transform_pool_lock:
+        if _transform_pool is None:
+            # spawn: workers import this module afresh, which has no side effects
+            _transform_pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _transform_pool
+
+class TransformError(ValueError):
+    """A page of source rows that prepare_* could not turn into parameters."""
+
+def prepare_checked(prepare, rows):
+    """
+    Run `prepare` on `rows`, turning any exception (e.g. JSONB of the wrong
+    shape) into a TransformError, so write_batch bisects it like other row
+    errors instead of failing the sync.
+    """
+    try:
+        return prepare(rows)
+    except Exception as e:
+        raise TransformError(f"{type(e).__name__}: {e}") from e
+
+def prepare_measured(prepare, rows):
+    """
+    prepare_checked, plus the size in bytes of the JSON encoding of its
+    parameters, which is roughly what is sent to Neo4j.
+    """
+    params = prepare_checked(prepare, rows)
+    return params, len(json.dumps(params, default=str))
+
+def prepare_rows(upsert, rows):
+    """
+    Run the transform stage of the batch writer `upsert` on `rows`, in the
+    process pool for large pages. Returns (params, payload_bytes) so the
+    writer does not have to measure the batch, or None if a row cannot be
+    transformed; write_batch then isolates it inside the write.
+    """
+    if not rows:
+        return None
+    try:
+        pool = get_transform_pool()
+        if pool is not None and len(rows) >= int(os.getenv("TRANSFORM_POOL_MIN_ROWS", "500")):
+            return pool.submit(prepare_measured, upsert.prepare, rows).result()
+        return prepare_measured(upsert.prepare, rows)
+    except TransformError:
+        return None
+
+def change_transform(changes, upsert):
+    """
+    Pipeline transform stage for a ChangeDetector and batch writer: split off
+    the unchanged rows, then prepare the changed ones. Yields
+    (batch, changed, prepared) for write_batch.
+    """
+    def transform(batch):
+        batch, changed = changes.split(batch)
+        return batch, changed, prepare_rows(upsert, [row for row, _ in changed])
+    return transform
+
+def load_json(value):
+    """Parse a JSON column delivered as text, with orjson when it is installed."""
+    return _json_loads(value)
+
+###################################################
+#                   MERGE FUNCTIONS                 #
+###################################################
+
+def split_list_field(value):
+    """Normalize a list-ish column (list, comma-separated string or scalar) to a list."""
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(',')]
+    elif not isinstance(value, list):
+        return [str(value)]
+    return value
+
+def sort_rows(rows, *keys):
+    """
+    Order UNWIND rows by the node keys they MERGE, so concurrent transactions
+    take locks on shared nodes in the same order instead of deadlocking.
+    """
+    return sorted(rows, key=lambda row: tuple((row.get(k) is None, str(row.get(k))) for k in keys))
+
+# Dimension nodes remembered per run by DimensionCache, unless
+# DIMENSION_CACHE_SIZE (read on first use) says otherwise
+DEFAULT_DIMENSION_CACHE_SIZE = "100000"
+
+class DimensionCache:
+    """
+    Bounded LRU of dimension nodes (and their static edges) already ensured
+    in Neo4j during this run, e.g. ('City', name, state) for a City with its
+    State and LOCATED_IN edge, ('Issue', name) or ('Person', name).
+
+    Writers MERGE only the keys reported `missing` and MATCH the rest. Keys
+    must be added only after the transaction that merged them has committed.
+    Shared by all sync threads.
+    """
+
+    def __init__(self, max_size=None):
+        # Resolved on first use; the shared cache is created at import
+        self.max_size = max_size
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def missing(self, keys):
+        """Return the keys that are not cached yet, refreshing the cached ones."""
+        result = []
+        with self._lock:
+            for key in keys:
+                if key in self._keys:
+                    self._keys.move_to_end(key)
+                else:
+                    result.append(key)
+        return result
+
+    def add(self, keys):
+        with self._lock:
+            for key in keys or ():
+                self._keys[key] = True
+                self._keys.move_to_end(key)
+            if self.max_size is None:
+                self.max_size = int(os.getenv("DIMENSION_CACHE_SIZE", DEFAULT_DIMENSION_CACHE_SIZE))
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+
+# Process-wide cache used by the sync entry points
+DIMENSIONS = DimensionCache()
+
+def aggregate_issue_mentions(topics):
+    """
+    Collapse HAS_TOPIC rows into one HAS_ISSUE delta per (city, state, topic):
+    mention count and first/last publish date. Sorted by key so concurrent
+    writers take the relationship locks in the same order.
+    """
+    mentions = {}
+    for t in topics:
+        key = (t['city'], t['state'], t['topic'])
+        m = mentions.setdefault(key, {
+            'city': t['city'], 'state': t['state'], 'topic': t['topic'],
+            'count': 0, 'first_mentioned': None, 'last_mentioned': None
+        })
+        m['count'] += 1
+        date = t['date_posted']
+        if date is not None:
+            if m['first_mentioned'] is None or date < m['first_mentioned']:
+                m['first_mentioned'] = date
+            if m['last_mentioned'] is None or date > m['last_mentioned']:
+                m['last_mentioned'] = date
+    return [mentions[key] for key in sorted(mentions)]
+
+def prepare_news_articles(rows):
+    """
+    Transform a page of news_articles rows into the sorted parameter lists
+    of news_articles_statements, outside any transaction.
+    """
+    articles = []
+    locations = []
+    topics = []
+    persons = []
+
+    for row in rows:
+        articles.append({
+            'id': row['id'],
+            'title': row['title'],
+            'summary': row['summary'],
+            'full_content': row['full_content'],
+            'date_posted': row['date_posted'],
+            'url': row['url'],
+            'sentiment': row['sentiment']
+        })
+
+        has_location = row.get('city_seo') and row.get('state_seo')
+        if has_location:
+            locations.append({
+                'article_id': row['id'],
+                'city': row['city_seo'],
+                'state': row['state_seo']
+            })
+
+        # Topics with enhanced relationships
+        article_topics = []
+        for topic_field in ['topic_1', 'topic_2', 'topic_3', 'main_topic']:
+            if row.get(topic_field):
+                article_topics.append(row[topic_field])
+
+        if row.get('topic_keywords'):
+            if isinstance(row['topic_keywords'], list):
+                article_topics.extend(row['topic_keywords'])
+            elif isinstance(row['topic_keywords'], str):
+                article_topics.extend(row['topic_keywords'].split(','))
+
+        # One HAS_TOPIC edge per article and topic, however often it is listed
+        seen_topics = set()
+        for topic in article_topics:
+            topic = topic.strip() if topic else topic
+            if topic and has_location and topic not in seen_topics:
+                seen_topics.add(topic)
+                topics.append({
+                    'topic': topic,
+                    'article_id': row['id'],
+                    'city': row['city_seo'],
+                    'state': row['state_seo'],
+                    'date_posted': row['date_posted']
+                })
+
+        # Entities (entity_person)
+        if row.get('entity_person'):
+            for person_name in split_list_field(row['entity_person']):
+                if person_name:
+                    persons.append({'name': person_name.strip(), 'article_id': row['id']})
+
+    return {
+        'articles': sort_rows(articles, 'id'),
+        'locations': sort_rows(locations, 'city', 'state', 'article_id'),
+        'topics': sort_rows(topics, 'topic', 'article_id'),
+        'persons': sort_rows(persons, 'name', 'article_id'),
+    }
+
+def news_articles_statements(params, dimensions=None):
+    """
+    Ingest a page of news_articles rows => Create or update (:Article) nodes
+    and their City/State, Issue and Person links with one UNWIND per statement.
+
+    City/State, Issue and Person nodes not yet in `dimensions` are MERGEd once
+    per batch; the per-article statements only MATCH them. Returns the
+    dimension keys merged, for the caller to add to the cache after commit.
+    """
+    articles = params['articles']
+    locations = params['locations']
+    topics = params['topics']
+    persons = params['persons']
+
+    if not articles:
+        return []
+
+    # Dimension nodes this batch needs that are not known to exist yet
+    wanted = [('City', r['city'], r['state']) for r in locations]
+    wanted += [('Issue', r['topic']) for r in topics]
+    wanted += [('Person', r['name']) for r in persons]
+    wanted = list(dict.fromkeys(wanted))
+    ensured = dimensions.missing(wanted) if dimensions is not None else wanted
+
+    new_cities = [{'city': k[1], 'state': k[2]} for k in ensured if k[0] == 'City']
+    new_issues = [k[1] for k in ensured if k[0] == 'Issue']
+    new_persons = [k[1] for k in ensured if k[0] == 'Person']
+
+    # City and State nodes with their static LOCATED_IN edge
+    if new_cities:
+        yield (
+            """
+            UNWIND $rows AS row
+            MERGE (c:City {name: row.city, state: row.state})
+            MERGE (s:State {name: row.state})
+            MERGE (c)-[:LOCATED_IN]->(s)
+            """,
+            {'rows': sort_rows(new_cities, 'city', 'state')}
+        )
+
+    if new_issues:
+        yield "UNWIND $names AS name MERGE (:Issue {name: name})", {'names': sorted(new_issues)}
+
+    if new_persons:
+        yield "UNWIND $names AS name MERGE (:Person {name: name})", {'names': sorted(new_persons)}
+
+    # Basic MERGE for the Article nodes, reporting existing ones whose
+    # sentiment changed so their trend partials can be corrected
+    records = yield (
+        """
+        UNWIND $rows AS row
+        OPTIONAL MATCH (old:Article {id: row.id})
+        WITH row, old IS NOT NULL AS existed, old.sentimentScore AS previous
+        MERGE (a:Article {id: row.id})
+        ON CREATE SET
+            a.title = row.title,
+            a.summary = row.summary,
+            a.content = row.full_content,
+            a.publishDate = row.date_posted,
+            a.url = row.url,
+            a.sentimentScore = row.sentiment
+        ON MATCH SET
+            a.summary = row.summary,    // update fields if changed
+            a.content = row.full_content,
+            a.sentimentScore = row.sentiment
+        WITH row, existed, previous
+        WHERE existed AND (
+            (previous IS NULL) <> (row.sentiment IS NULL) OR previous <> row.sentiment
+        )
+        RETURN row.id AS id, previous
+        """,
+        {'rows': articles}
+    )
+    rescored = {record['id']: record['previous'] for record in records}
+
+    # City relationships
+    if locations:
+        yield (
+            """
+            UNWIND $rows AS row
+            MATCH (c:City {name: row.city, state: row.state})
+            MATCH (a:Article {id: row.article_id})
+            MERGE (a)-[:PUBLISHED_IN]->(c)
+            """,
+            {'rows': locations}
+        )
+
+    # HAS_TOPIC relationships, reporting the ones that did not exist before
+    # and those of re-scored articles
+    if topics:
+        records = yield (
+            """
+            UNWIND $rows AS row
+            MATCH (i:Issue {name: row.topic})
+            MATCH (a:Article {id: row.article_id})
+            OPTIONAL MATCH (a)-[existing:HAS_TOPIC]->(i)
+            WITH a, i, row, existing IS NULL AS isNew
+            MERGE (a)-[ht:HAS_TOPIC]->(i)
+            ON CREATE SET
+                ht.publishDate = row.date_posted,
+                ht.createdAt = datetime()
+            ON MATCH SET
+                ht.updatedAt = datetime()
+            WITH row, ht, isNew
+            WHERE isNew OR row.article_id IN $rescored
+            RETURN row.article_id AS article_id, row.topic AS topic,
+                   isNew AS is_new, ht.publishDate AS publish_date
+            """,
+            {'rows': topics, 'rescored': sorted(rescored)}
+        )
+        new_topics = {(record['article_id'], record['topic']) for record in records if record['is_new']}
+
+        # HAS_ISSUE counters only grow by the newly created HAS_TOPIC edges,
+        # so re-syncing an article does not count its topics again
+        mentions = aggregate_issue_mentions(
+            [t for t in topics if (t['article_id'], t['topic']) in new_topics]
+        )
+        if mentions:
+            yield (
+                """
+                UNWIND $rows AS row
+                MATCH (c:City {name: row.city, state: row.state})
+                MATCH (i:Issue {name: row.topic})
+                MERGE (c)-[hi:HAS_ISSUE]->(i)
+                ON CREATE SET
+                    hi.firstMentioned = row.first_mentioned,
+                    hi.lastMentioned = row.last_mentioned,
+                    hi.mentionCount = row.count,
+                    hi.createdAt = datetime()
+                ON MATCH SET
+                    hi.firstMentioned = CASE
+                        WHEN hi.firstMentioned IS NULL OR row.first_mentioned < hi.firstMentioned
+                        THEN row.first_mentioned ELSE hi.firstMentioned END,
+                    hi.lastMentioned = CASE
+                        WHEN hi.lastMentioned IS NULL OR row.last_mentioned > hi.lastMentioned
+                        THEN row.last_mentioned ELSE hi.lastMentioned END,
+                    hi.mentionCount = coalesce(hi.mentionCount, 0) + row.count,
+                    hi.updatedAt = datetime()
+                """,
+                {'rows': mentions}
+            )
+
+        # Trend partials take the same new edges, plus the sentiment change
+        # of existing edges whose article was re-scored
+        topic_rows = {(t['article_id'], t['topic']): t for t in topics}
+        sentiments = {a['id']: a['sentiment'] for a in articles}
+        yield from trend_delta_statements([
+            trend_delta(topic_rows[(record['article_id'], record['topic'])], record['publish_date'],
+                        sentiments[record['article_id']], record['is_new'],
+                        rescored.get(record['article_id']))
+            for record in records
+        ])
+
+    if persons:
+        yield (
+            """
+            UNWIND $rows AS row
+            MATCH (p:Person {name: row.name})
+            MATCH (a:Article {id: row.article_id})
+            MERGE (a)-[:MENTIONS_PERSON]->(p)
+            """,
+            {'rows': persons}
+        )
+
+    return ensured
+
+upsert_news_articles_batch = transaction_writer(prepare_news_articles, news_articles_statements)
+
+def upsert_news_article(tx, row):
+    """
+    Ingest data from news_articles table => Create or update (:Article).
+    """
+    upsert_news_articles_batch(tx, [row])
+
+def prepare_articles_table(rows):
+    """
+    Transform a page of articles rows into the sorted parameter lists
+    of articles_table_statements, outside any transaction.
+    """
+    metrics = [
+        {
+            'na_id': row['news_article_id'],
+            'engagement_score': row.get('engagement_score'),
+            'view_count': row.get('view_count'),
+            'share_count': row.get('share_count'),
+            'comment_count': row.get('comment_count'),
+            'reading_time_minutes': row.get('reading_time_minutes'),
+            'complexity_score': row.get('complexity_score'),
+            'fact_density': row.get('fact_density'),
+            'is_opinion': row.get('is_opinion'),
+            'sentiment_category': row.get('sentiment_category')
+        }
+        for row in rows
+        if row.get('news_article_id') is not None
+    ]
+
+    return {
+        'metrics': sort_rows(metrics, 'na_id'),
+    }
+
+def articles_table_statements(params, dimensions=None):
+    """
+    Ingest a page of articles rows => augment the same (:Article) nodes.
+    """
+    metrics = params['metrics']
+
+    if not metrics:
+        return
+
+    yield (
+        """
+        UNWIND $rows AS row
+        MERGE (a:Article {id: row.na_id})
+        ON MATCH SET
+            a.engagementScore = row.engagement_score,
+            a.viewCount = row.view_count,
+            a.shareCount = row.share_count,
+            a.commentCount = row.comment_count,
+            a.readingTime = row.reading_time_minutes,
+            a.complexityScore = row.complexity_score,
+            a.factDensity = row.fact_density,
+            a.isOpinion = row.is_opinion,
+            a.sentimentCategory = row.sentiment_category
+        """,
+        {'rows': metrics}
+    )
+
+upsert_articles_table_batch = transaction_writer(prepare_articles_table, articles_table_statements)
+
+def upsert_articles_table(tx, row):
+    """
+    Ingest data from articles table => augment the same (:Article) node.
+    """
+    upsert_articles_table_batch(tx, [row])
+
+def convert_decimal(value):
+    """Convert Decimal types to float for Neo4j compatibility."""
+    if isinstance(value, Decimal):
+        return float(value)
+    elif isinstance(value, dict):
+        return {k: convert_decimal(v) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [convert_decimal(v) for v in value]
+    return value
+
+def prepare_council_articles(rows):
+    """
+    Transform a page of council_meeting_articles rows into the sorted parameter lists
+    of council_articles_statements, outside any transaction.
+    """
+    articles = []
+    meetings = []
+    insights = []
+    topics = []
+
+    for row in rows:
+        # Convert any Decimal values to float
+        data = convert_decimal(row)
+        article_id = str(data['id'])
+
+        articles.append({
+            'id': article_id,
+            'article_title': data.get('article_title'),
+            'article_content': data.get('article_content'),
+            'summary': data.get('summary'),
+            'importance_score': data.get('importance_score')
+        })
+
+        # Link to Meeting
+        if data.get('video_id'):
+            meetings.append({'video_id': str(data['video_id']), 'article_id': article_id})
+
+        # Related insights
+        if data.get('related_insight_ids'):
+            for insight_id in split_list_field(data['related_insight_ids']):
+                insights.append({'insight_id': str(insight_id), 'article_id': article_id})
+
+        # Topic tags
+        if data.get('topic_tags'):
+            for topic in split_list_field(data['topic_tags']):
+                topics.append({'topic': topic, 'article_id': article_id})
+
+    return {
+        'articles': sort_rows(articles, 'id'),
+        'meetings': sort_rows(meetings, 'video_id', 'article_id'),
+        'insights': sort_rows(insights, 'insight_id', 'article_id'),
+        'topics': sort_rows(topics, 'topic', 'article_id'),
+    }
+
+def council_articles_statements(params, dimensions=None):
+    """
+    Ingest a page of council_meeting_articles rows.
+    """
+    articles = params['articles']
+    meetings = params['meetings']
+    insights = params['insights']
+    topics = params['topics']
+
+    if not articles:
+        return
+
+    yield (
+        """
+        UNWIND $rows AS row
+        MERGE (a:Article {id: row.id})
+        ON CREATE SET
+            a.title = row.article_title,
+            a.content = row.article_content,
+            a.summary = row.summary,
+            a.sourceType = "CouncilMeeting",
+            a.importanceScore = row.importance_score
+        """,
+        {'rows': articles}
+    )
+
+    if meetings:
+        yield (
+            """
+            UNWIND $rows AS row
+            MERGE (m:Meeting {id: row.video_id})
+            WITH m, row
+            MATCH (a:Article {id: row.article_id})
+            MERGE (m)-[:HAS_ARTICLE]->(a)
+            """,
+            {'rows': meetings}
+        )
+
+    if insights:
+        yield (
+            """
+            UNWIND $rows AS row
+            MERGE (i:Insight {id: row.insight_id})
+            WITH i, row
+            MATCH (a:Article {id: row.article_id})
+            MERGE (a)-[:HAS_INSIGHT]->(i)
+            """,
+            {'rows': insights}
+        )
+
+    if topics:
+        yield (
+            """
+            UNWIND $rows AS row
+            MERGE (t:Issue {name: row.topic})
+            WITH t, row
+            MATCH (a:Article {id: row.article_id})
+            MERGE (a)-[:HAS_TOPIC]->(t)
+            """,
+            {'rows': topics}
+        )
+
+upsert_council_articles_batch = transaction_writer(prepare_council_articles, council_articles_statements)
+
+def upsert_council_article(tx, row):
+    """
+    Ingest data from council_meeting_articles.
+    """
+    upsert_council_articles_batch(tx, [row])
+
+# Entity types from the insights `entities` JSONB, keyed by the label they are stored under
+ENTITY_TYPE_ALIASES = {
+    'person': ['person', 'persons', 'people'],
+    'organization': ['organization', 'organizations', 'org', 'orgs'],
+    'location': ['location', 'locations', 'place', 'places'],
+}
+
+ENTITY_QUERIES = {
+    'person': """
+        UNWIND $rows AS row
+        MERGE (p:Person {name: row.name})
+        WITH p, row
+        MATCH (i:Insight {id: row.insight_id})
+        MERGE (i)-[:MENTIONS_ENTITY {type: 'person'}]->(p)
+        """,
+    'organization': """
+        UNWIND $rows AS row
+        MERGE (o:Organization {name: row.name})
+        WITH o, row
+        MATCH (i:Insight {id: row.insight_id})
+        MERGE (i)-[:MENTIONS_ENTITY {type: 'organization'}]->(o)
+        """,
+    'location': """
+        UNWIND $rows AS row
+        MERGE (l:Location {name: row.name})
+        WITH l, row
+        MATCH (i:Insight {id: row.insight_id})
+        MERGE (i)-[:MENTIONS_ENTITY {type: 'location'}]->(l)
+        """,
+    # Generic entity
+    'entity': """
+        UNWIND $rows AS row
+        MERGE (e:Entity {name: row.name, type: row.type})
+        WITH e, row
+        MATCH (i:Insight {id: row.insight_id})
+        MERGE (i)-[:MENTIONS_ENTITY {type: row.type}]->(e)
+        """,
+}
+
+def entity_kind(entity_type):
+    """Map an `entities` JSONB key to one of the ENTITY_QUERIES kinds."""
+    for kind, aliases in ENTITY_TYPE_ALIASES.items():
+        if entity_type.lower() in aliases:
+            return kind
+    return 'entity'
+
+def prepare_council_insights(rows):
+    """
+    Transform a page of council_meeting_insights rows into the sorted parameter lists
+    of council_insights_statements, outside any transaction.
+    """
+    insights = []
+    meetings = []
+    quotes = []
+    entities_by_kind = {kind: [] for kind in ENTITY_QUERIES}
+    figures = []
+    topics = []
+
+    for row in rows:
+        # Convert any Decimal values to float
+        data = convert_decimal(row)
+        insight_id = str(data['id'])
+
+        insights.append({
+            'id': insight_id,
+            'category': data.get('category'),
+            'insight_title': data.get('insight_title'),
+            'insight_description': data.get('insight_description'),
+            'vote_result': data.get('vote_result'),
+            'next_steps': data.get('next_steps'),
+            'sentiment': data.get('sentiment'),
+            'importance': data.get('importance'),
+            'start_time': data.get('start_time'),
+            'end_time': data.get('end_time'),
+            'timestamp': data.get('timestamp'),
+            'city': data.get('city'),
+            'created_at': data.get('created_at')
+        })
+
+        # Link to Meeting (Council Video) and city
+        if data.get('video_id'):
+            meetings.append({
+                'video_id': str(data['video_id']),
+                'insight_id': insight_id,
+                'city': data.get('city'),
+                'start_time': data.get('start_time'),
+                'end_time': data.get('end_time'),
+                'timestamp': data.get('timestamp')
+            })
+
+        # Process Quotes - convert from JSONB to Python objects
+        if data.get('quotes'):
+            row_quotes = data['quotes']
+            if isinstance(row_quotes, str):
+                try:
+                    row_quotes = load_json(row_quotes)
+                except ValueError:
+                    row_quotes = []
+
+            # If it's a list of quotes
+            if isinstance(row_quotes, list):
+                for idx, quote in enumerate(row_quotes):
+                    # Handle different quote formats
+                    if isinstance(quote, dict):
+                        quote_text = quote.get('quote') or quote.get('text')
+                        speaker = quote.get('speaker')
+                    else:
+                        quote_text = str(quote) if quote else None
+                        speaker = None
+
+                    # Skip quotes with null text
+                    if not quote_text:
+                        continue
+
+                    quotes.append({
+                        'text': quote_text,
+                        'insight_id': insight_id,
+                        'idx': idx,
+                        'speaker': speaker or None
+                    })
+
+        # Process Entities - convert from JSONB to Python objects
+        if data.get('entities'):
+            row_entities = data['entities']
+            if isinstance(row_entities, str):
+                try:
+                    row_entities = load_json(row_entities)
+                except ValueError:
+                    row_entities = {}
+
+            # Process entities by type (assuming structure like {organizations: [], persons: [], etc.})
+            if not isinstance(row_entities, dict):
+                raise ValueError(f"entities is a {type(row_entities).__name__}, expected a JSON object")
+            for entity_type, entity_list in row_entities.items():
+                if isinstance(entity_list, list):
+                    kind = entity_kind(entity_type)
+                    for entity_name in entity_list:
+                        entities_by_kind[kind].append({
+                            'name': entity_name,
+                            'type': entity_type.lower(),
+                            'insight_id': insight_id
+                        })
+
+        # Key figures
+        if data.get('key_figures'):
+            for figure in split_list_field(data['key_figures']):
+                figures.append({'name': figure, 'insight_id': insight_id})
+
+        # Related topics
+        if data.get('related_topics'):
+            for topic in split_list_field(data['related_topics']):
+                topics.append({'topic': topic, 'insight_id': insight_id, 'city': data.get('city')})
+
+    return {
+        'insights': sort_rows(insights, 'id'),
+        'meetings': sort_rows(meetings, 'video_id', 'city', 'insight_id'),
+        'quotes': sort_rows(quotes, 'speaker', 'insight_id', 'idx'),
+        'entities_by_kind': {kind: sort_rows(entity_rows, 'name', 'type', 'insight_id')
+                             for kind, entity_rows in entities_by_kind.items()},
+        'figures': sort_rows(figures, 'name', 'insight_id'),
+        'topics': sort_rows(topics, 'topic', 'city', 'insight_id'),
+    }
+
+def council_insights_statements(params, dimensions=None):
+    """
+    Ingest a page of council_meeting_insights rows.
+    """
+    insights = params['insights']
+    meetings = params['meetings']
+    quotes = params['quotes']
+    entities_by_kind = params['entities_by_kind']
+    figures = params['figures']
+    topics = params['topics']
+
+    if not insights:
+        return
+
+    # Create the Insight nodes with additional properties
+    yield (
+        """
+        UNWIND $rows AS row
+        MERGE (i:Insight {id: row.id})
+        ON CREATE SET
+            i.category = row.category,
+            i.title = row.insight_title,
+            i.description = row.insight_description,
+            i.voteResult = row.vote_result,
+            i.nextSteps = row.next_steps,
+            i.sentiment = row.sentiment,
+            i.importance = row.importance,
+            i.startTime = row.start_time,
+            i.endTime = row.end_time,
+            i.timestamp = row.timestamp,
+            i.city = row.city,
+            i.createdAt = row.created_at
+        ON MATCH SET
+            i.category = row.category,
+            i.title = row.insight_title,
+            i.description = row.insight_description,
+            i.voteResult = row.vote_result,
+            i.nextSteps = row.next_steps,
+            i.sentiment = row.sentiment,
+            i.importance = row.importance,
+            i.city = row.city
+        """,
+        {'rows': insights}
+    )
+
+    if meetings:
+        # Relationship properties are only overwritten when the row has a value
+        yield (
+            """
+            UNWIND $rows AS row
+            MERGE (m:Meeting {id: row.video_id})
+            ON CREATE SET
+                m.sourceType = "CouncilMeeting",
+                m.city = row.city
+            WITH m, row
+            MATCH (i:Insight {id: row.insight_id})
+            MERGE (m)-[r:HAS_INSIGHT]->(i)
+            SET r.startTime = coalesce(row.start_time, r.startTime),
+                r.endTime = coalesce(row.end_time, r.endTime),
+                r.timestamp = coalesce(row.timestamp, r.timestamp)
+            WITH i, row
+            MERGE (c:City {name: row.city})
+            MERGE (i)-[:ABOUT_CITY]->(c)
+            """,
+            {'rows': meetings}
+        )
+
+    if quotes:
+        # If speaker is identified, create person node
+        yield (
+            """
+            UNWIND $rows AS row
+            MERGE (q:Quote {text: row.text, insightId: row.insight_id, index: row.idx})
+            WITH q, row
+            MATCH (i:Insight {id: row.insight_id})
+            MERGE (i)-[:HAS_QUOTE]->(q)
+            WITH q, row
+            WHERE row.speaker IS NOT NULL
+            MERGE (p:Person {name: row.speaker})
+            MERGE (p)-[:STATED]->(q)
+            """,
+            {'rows': quotes}
+        )
+
+    for kind, entity_rows in entities_by_kind.items():
+        if entity_rows:
+            yield ENTITY_QUERIES[kind], {'rows': entity_rows}
+
+    if figures:
+        yield (
+            """
+            UNWIND $rows AS row
+            MERGE (p:Person {name: row.name})
+            WITH p, row
+            MATCH (i:Insight {id: row.insight_id})
+            MERGE (i)-[:MENTIONS_FIGURE]->(p)
+            """,
+            {'rows': figures}
+        )
+
+    if topics:
+        yield (
+            """
+            UNWIND $rows AS row
+            MERGE (t:Issue {name: row.topic})
+            WITH t, row
+            MATCH (i:Insight {id: row.insight_id})
+            MERGE (i)-[:CONCERNS_TOPIC]->(t)
+            WITH t, row
+            MERGE (c:City {name: row.city})
+            MERGE (c)-[:HAS_ISSUE]->(t)
+            """,
+            {'rows': topics}
+        )
+
+upsert_council_insights_batch = transaction_writer(prepare_council_insights, council_insights_statements)
+
+def upsert_council_insight(tx, row):
+    """
+    Ingest data from council_meeting_insights.
+    """
+    upsert_council_insights_batch(tx, [row])
+
+def prepare_council_videos(rows):
+    """
+    Transform a page of council_meeting_videos rows into the sorted parameter lists
+    of council_videos_statements, outside any transaction.
+    """
+    meetings = []
+    for row in rows:
+        # Convert any Decimal values to float
+        data = convert_decimal(row)
+        meetings.append({
+            'id': str(data['id']),
+            'youtube_url': data.get('youtube_url'),
+            'meeting_title': data.get('meeting_title'),
+            'meeting_date': data.get('meeting_date'),
+            'video_duration': data.get('video_duration'),
+            'city': data.get('city'),
+            'youtube_video_id': data.get('youtube_video_id'),
+            'created_at': data.get('created_at')
+        })
+
+    return {
+        'meetings': sort_rows(meetings, 'city', 'id'),
+    }
+
+def council_videos_statements(params, dimensions=None):
+    """
+    Ingest a page of council_meeting_videos rows.
+    """
+    meetings = params['meetings']
+
+    if not meetings:
+        return
+
+    # Create the Meeting nodes and link them to their city
+    yield (
+        """
+        UNWIND $rows AS row
+        MERGE (m:Meeting {id: row.id})
+        ON CREATE SET
+            m.youtubeUrl = row.youtube_url,
+            m.title = row.meeting_title,
+            m.meetingDate = row.meeting_date,
+            m.duration = row.video_duration,
+            m.sourceType = "CouncilMeeting",
+            m.city = row.city,
+            m.youtubeVideoId = row.youtube_video_id,
+            m.createdAt = row.created_at
+        ON MATCH SET
+            m.youtubeUrl = row.youtube_url,
+            m.title = row.meeting_title,
+            m.meetingDate = row.meeting_date,
+            m.duration = row.video_duration,
+            m.city = row.city,
+            m.youtubeVideoId = row.youtube_video_id
+        WITH m, row
+        MERGE (c:City {name: row.city})
+        MERGE (c)-[:HAS_MEETING]->(m)
+        """,
+        {'rows': meetings}
+    )
+
+upsert_council_videos_batch = transaction_writer(prepare_council_videos, council_videos_statements)
+
+def upsert_council_video(tx, row):
+    """
+    Ingest data from council_meeting_videos.
+    """
+    upsert_council_videos_batch(tx, [row])
+
+###################################################
+#                   BATCH WRITES                   #
+###################################################
+
+# Failures caused by the rows themselves (bad values, a constraint
+# violation, a row prepare_* cannot transform). A batch failing with one of
+# these is bisected. Python errors raised inside a statement plan are bugs
+# and crash the run. TransientError is not among them either: once
+# execute_write has used up its retries the database is unavailable, and
+# bisecting would only repeat those retries for every half.
+ROW_ERRORS = (ClientError, TransformError)
+# Client errors that no row can cause, e.g. a broken query after an edit
+FATAL_ERRORS = (AuthError, Forbidden, CypherSyntaxError)
+
+class FailureLimitError(RuntimeError):
+    """Too many rows of a table failed to be a problem with the rows themselves."""
+
+class FailureBreaker:
+    """
+    Per-table guard that stops a sync instead of dead-lettering whole
+    batches when the failures point at the code or the database rather
+    than the rows. Trips when every row of a batch of at least
+    FAILURE_BREAKER_MIN_ROWS fails, or when more than FAILURE_BREAKER_RATE
+    of the rows of the last FAILURE_BREAKER_WINDOW batches failed. Safe to
+    share between the partitions of one table.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.min_rows = int(os.getenv("FAILURE_BREAKER_MIN_ROWS", "10"))
+        self.max_rate = float(os.getenv("FAILURE_BREAKER_RATE", "0.5"))
+        self._recent = deque(maxlen=int(os.getenv("FAILURE_BREAKER_WINDOW", "10")))
+        self._lock = threading.Lock()
+
+    def check(self, rows, failed):
+        """Record a written batch; raise FailureLimitError if it trips the breaker."""
+        with self._lock:
+            self._recent.append((rows, failed))
+            total = sum(r for r, _ in self._recent)
+            failures = sum(f for _, f in self._recent)
+        if failed and failed == rows and rows >= self.min_rows:
+            reason = f"all {rows} rows of a batch failed"
+        elif failures and total >= self.min_rows and failures > self.max_rate * total:
+            reason = f"{failures} of the last {total} rows failed"
+        else:
+            return
+        raise FailureLimitError(f"[{self.table}] Stopping: {reason}")
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_failure_breaker(table):
+    """Return the process-wide FailureBreaker for `table`."""
+    with _breakers_lock:
+        if table not in _breakers:
+            _breakers[table] = FailureBreaker(table)
+        return _breakers[table]
+
+def check_failures(table, rows, failed):
+    """Pass a written batch to the table's FailureBreaker, chaining the first row error."""
+    try:
+        get_failure_breaker(table).check(len(rows), len(failed))
+    except FailureLimitError as e:
+        raise e from failed[0][1]
+
+def _write_bisected(session, attempt, upsert, rows, dimensions, stats, prepared=None):
+    stats['calls'] += 1
+    try:
+        if prepared is not None:
+            ensured = session.execute_write(attempt, upsert.prepared, prepared)
+        else:
+            ensured = session.execute_write(attempt, upsert, rows)
+    except FATAL_ERRORS:
+        raise
+    except ROW_ERRORS as e:
+        if len(rows) == 1:
+            return [(rows[0], e)]
+        # Halves are prepared again inside their own transactions
+        middle = len(rows) // 2
+        return (_write_bisected(session, attempt, upsert, rows[:middle], dimensions, stats)
+                + _write_bisected(session, attempt, upsert, rows[middle:], dimensions, stats))
+    if dimensions is not None:
+        dimensions.add(ensured)
+    return []
+
+def failure_stage(error):
+    """'write' for errors raised by Neo4j, 'transform' for errors building the parameters."""
+    return 'write' if isinstance(error, ClientError) else 'transform'
+
+def write_batch(session, upsert, rows, table, dimensions=None, sizer=None, prepared=None,
+                guard=True):
+    """
+    Write `rows` with the batch writer `upsert` in a managed transaction,
+    using the params of `prepared` (from prepare_rows) when given.
+
+    execute_write retries transient errors such as DeadlockDetected with
+    jittered exponential backoff and raises them once its retries are used
+    up. A batch that fails with a row error (ROW_ERRORS) is split in halves
+    until the failing rows are isolated; the rest is committed and the
+    failing rows are logged, added to the dead-letter store (see
+    replay_dlq.py) and returned as (row, error) pairs. With `guard`, a
+    batch that trips the table's FailureBreaker raises FailureLimitError
+    instead, so the caller does not checkpoint past it.
+
+    With a `sizer` (BatchSizer), the commit latency, payload size measured
+    by prepare_rows and number of transaction retries are reported to it.
+    """
+    stats = {'calls': 0, 'attempts': 0}
+
+    def attempt(tx, write, payload):
+        stats['attempts'] += 1
+        return write(tx, payload, dimensions)
+
+    params, payload_bytes = prepared if prepared is not None else (None, 0)
+    started = time.monotonic()
+    failed = _write_bisected(session, attempt, upsert, rows, dimensions, stats, params)
+    if sizer is not None:
+        sizer.observe(len(rows), time.monotonic() - started,
+                      payload_bytes=payload_bytes,
+                      retries=stats['attempts'] - stats['calls'])
+    if guard:
+        check_failures(table, rows, failed)
+    return dead_letter_failures(table, failed)
+
+def dead_letter_failures(table, failed):
+    """
+    Log the (row, error) pairs a bisected write could not commit
+    and add them to the dead-letter store. Returns `failed`.
+    """
+    for row, error in failed:
+        print(f"[{table}] Skipping row {row.get('id')} ({failure_stage(error)}): {str(error)}")
+    if failed:
+        get_checkpoint_store().add_dead_letters(
+            table, [(row.get('id'), failure_stage(error), error) for row, error in failed]
+        )
+    return failed
@@ -0,0 +1,101 @@
+import sys
+import argparse
+from schema_setup import require_schema
+from checkpoint_store import get_checkpoint_store, ChangeDetector
+from sync_pipeline import iter_batches, get_batch_sizer, TABLE_DEPENDENCIES
+from connections import load_environment, pg_connection, get_neo4j_driver, close_connections
+from source_queries import SOURCE_COLUMNS, projected_select, stream_rows
+from graph_writers import DIMENSIONS, write_batch
+from sync_to_neo4j import FULL_SYNC_TABLES, FULL_SYNC_BATCH_SIZE
+
+def list_dead_letters(table=None):
+    dead_letters = get_checkpoint_store().get_dead_letters(table)
+    if not dead_letters:
+        print("No dead-lettered rows")
+        return
+    for entry in dead_letters:
+        print(f"[{entry['table_name']}] {entry['row_id']} ({entry['stage']}, "
+              f"{entry['attempts']} attempts, last {entry['last_failed_at']}): {entry['error']}")
+    print(f"\n{len(dead_letters)} dead-lettered rows")
+
+def replay_table(pg_conn, neo4j_driver, table, row_ids):
+    """
+    Re-read the dead-lettered rows of `table` from Postgres and write them
+    again. Rows that now succeed leave the dead-letter store; rows that fail
+    again stay in it with their attempt count bumped. Returns
+    (replayed, still_failing).
+    """
+    store = get_checkpoint_store()
+    spec = FULL_SYNC_TABLES[table]
+    changes = ChangeDetector(table, SOURCE_COLUMNS[table], force=True)
+    sizer = get_batch_sizer(table, FULL_SYNC_BATCH_SIZE)
+
+    rows = list(stream_rows(pg_conn, projected_select(table, "id::text = ANY(%s)", "id"), [row_ids]))
+
+    # Rows deleted from Postgres since they failed have nothing left to sync
+    found = {str(row['id']) for row in rows}
+    gone = [row_id for row_id in row_ids if row_id not in found]
+    if gone:
+        print(f"[{table}] {len(gone)} dead-lettered rows no longer exist, dropping them")
+        store.remove_dead_letters(table, gone)
+
+    replayed = 0
+    still_failing = 0
+    with neo4j_driver.session() as session:
+        for batch in iter_batches(rows, sizer.current):
+            _, changed = changes.split(batch)
+            # Rows replayed here failed before, so many failing again is expected
+            failed = write_batch(session, spec['upsert'], batch, table, DIMENSIONS, sizer, guard=False)
+            changes.record(changed, failed)
+
+            failed_ids = {str(row['id']) for row, _ in failed}
+            written = [str(row['id']) for row in batch if str(row['id']) not in failed_ids]
+            store.remove_dead_letters(table, written)
+            replayed += len(written)
+            still_failing += len(failed)
+
+    print(f"[{table}] Replayed {replayed} rows, {still_failing} still failing")
+    return replayed, still_failing
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Retry rows that failed during earlier syncs')
+    parser.add_argument('--table', choices=list(FULL_SYNC_TABLES),
+                        help='Only replay rows of this table')
+    parser.add_argument('--list', action='store_true',
+                        help='Only list the dead-lettered rows, do not replay them')
+    return parser.parse_args()
+
+def main():
+    load_environment()
+    args = parse_args()
+    if args.list:
+        list_dead_letters(args.table)
+        return
+
+    by_table = {}
+    for entry in get_checkpoint_store().get_dead_letters(args.table):
+        by_table.setdefault(entry['table_name'], []).append(entry['row_id'])
+    if not by_table:
+        print("No dead-lettered rows to replay")
+        return
+
+    neo4j_driver = get_neo4j_driver()
+    try:
+        require_schema(neo4j_driver)
+
+        still_failing = 0
+        with pg_connection() as pg_conn:
+            # Replay tables others depend on first, e.g. videos before insights
+            for table in sorted(by_table, key=lambda t: t in TABLE_DEPENDENCIES):
+                _, failing = replay_table(pg_conn, neo4j_driver, table, by_table[table])
+                still_failing += failing
+
+        if still_failing:
+            print(f"\n{still_failing} rows are still dead-lettered (see --list)")
+            sys.exit(1)
+        print("\nAll dead-lettered rows replayed successfully! 🎉")
+    finally:
+        close_connections()
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,7 @@ cd ~/knowledgegraph
 source venv/bin/activate
 
 # Run the daily sync script
-python3 sync_daily_updates.py >> sync_daily.log 2>&1
+python3 sync_daily_updates.py --workers 3 >> sync_daily.log 2>&1
 
 # Deactivate virtual environment
 deactivate 
\ No newline at end of file
@@ -0,0 +1,156 @@
+import sys
+import argparse
+from connections import load_environment, get_neo4j_driver, close_connections
+
+###################################################
+#                 SCHEMA DEFINITION                #
+###################################################
+
+# Uniqueness constraints backing every MERGE key used by the sync writers.
+# Each entry: (name, label, properties)
+CONSTRAINTS = [
+    ("article_id_unique", "Article", ["id"]),
+    ("city_name_state_unique", "City", ["name", "state"]),
+    ("state_name_unique", "State", ["name"]),
+    ("issue_name_unique", "Issue", ["name"]),
+    ("person_name_unique", "Person", ["name"]),
+    ("meeting_id_unique", "Meeting", ["id"]),
+    ("insight_id_unique", "Insight", ["id"]),
+    ("organization_name_unique", "Organization", ["name"]),
+    ("location_name_unique", "Location", ["name"]),
+    ("entity_name_type_unique", "Entity", ["name", "type"]),
+    ("topic_trend_daily_unique", "TopicTrendDaily", ["topicName", "cityName", "day"]),
+    ("topic_trend_weekly_unique", "TopicTrendWeekly", ["topicName", "cityName", "yearWeek"]),
+    ("topic_trend_monthly_unique", "TopicTrend", ["topicName", "cityName", "yearMonth"]),
+]
+
+# Range indexes for MERGE/MATCH keys that cannot carry a uniqueness constraint.
+# Each entry: (name, label or relationship type, properties, is_relationship)
+INDEXES = [
+    # Council writers MERGE (:City {name}) without a state
+    ("city_name_index", "City", ["name"], False),
+    # Quote text can exceed the index key size limit, so index the rest of the key
+    ("quote_insight_index", "Quote", ["insightId", "index"], False),
+    # Date range filter used by aggregator_weekly.py and aggregator_monthly.py
+    ("has_topic_publish_date_index", "HAS_TOPIC", ["publishDate"], True),
+    # Daily buckets of one week or month, rolled up by the aggregators
+    ("topic_trend_daily_week_index", "TopicTrendDaily", ["yearWeek"], False),
+    ("topic_trend_daily_month_index", "TopicTrendDaily", ["yearMonth"], False),
+]
+
+def constraint_statement(name, label, properties):
+    if len(properties) == 1:
+        key = f"n.{properties[0]}"
+    else:
+        key = "(" + ", ".join(f"n.{p}" for p in properties) + ")"
+    return f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE {key} IS UNIQUE"
+
+def index_statement(name, label, properties, is_relationship):
+    pattern = f"()-[n:{label}]-()" if is_relationship else f"(n:{label})"
+    key = ", ".join(f"n.{p}" for p in properties)
+    return f"CREATE INDEX {name} IF NOT EXISTS FOR {pattern} ON ({key})"
+
+###################################################
+#                  SCHEMA CHECKS                   #
+###################################################
+
+def get_existing_schema(session):
+    """Return the (label, properties) keys of existing uniqueness constraints and range indexes."""
+    constraints = set()
+    # Neo4j 4 reports UNIQUENESS / NODE_KEY, Neo4j 5 NODE_PROPERTY_UNIQUENESS / NODE_KEY
+    for record in session.run(
+        "SHOW CONSTRAINTS YIELD type, labelsOrTypes, properties "
+        "WHERE type CONTAINS 'UNIQUENESS' OR type ENDS WITH 'KEY'"
+    ):
+        constraints.add((record['labelsOrTypes'][0], tuple(record['properties'])))
+
+    indexes = set()
+    for record in session.run(
+        "SHOW INDEXES YIELD type, labelsOrTypes, properties "
+        "WHERE type = 'RANGE' AND labelsOrTypes IS NOT NULL"
+    ):
+        indexes.add((record['labelsOrTypes'][0], tuple(record['properties'])))
+
+    return constraints, indexes
+
+def find_missing_schema(driver):
+    """Return the names of required constraints and indexes that do not exist yet."""
+    with driver.session() as session:
+        constraints, indexes = get_existing_schema(session)
+
+    missing = []
+    for name, label, properties in CONSTRAINTS:
+        if (label, tuple(properties)) not in constraints:
+            missing.append(name)
+    for name, label, properties, _ in INDEXES:
+        key = (label, tuple(properties))
+        # A uniqueness constraint on the same key already provides the index
+        if key not in indexes and key not in constraints:
+            missing.append(name)
+    return missing
+
+def ensure_schema(driver):
+    """Create every missing constraint and index. Safe to run repeatedly."""
+    missing = find_missing_schema(driver)
+    if not missing:
+        print("✓ All constraints and indexes already exist")
+        return []
+
+    statements = {name: constraint_statement(name, label, props)
+                  for name, label, props in CONSTRAINTS}
+    statements.update({name: index_statement(name, label, props, is_rel)
+                       for name, label, props, is_rel in INDEXES})
+
+    failed = []
+    with driver.session() as session:
+        for name in missing:
+            print(f"Creating {name}...")
+            try:
+                session.run(statements[name]).consume()
+            except Exception as e:
+                # e.g. existing duplicate nodes prevent a uniqueness constraint
+                print(f"Error creating {name}: {str(e)}")
+                failed.append(name)
+
+    print(f"Created {len(missing) - len(failed)} of {len(missing)} missing constraints/indexes")
+    return failed
+
+def require_schema(driver):
+    """Refuse to start a sync when required constraints or indexes are missing."""
+    missing = find_missing_schema(driver)
+    if missing:
+        print("\n" + "!" * 60)
+        print("Missing Neo4j constraints/indexes: " + ", ".join(missing))
+        print("Every MERGE on these keys is a full label scan.")
+        print("Run `python3 schema_setup.py` before syncing.")
+        print("!" * 60)
+        raise RuntimeError(f"Missing Neo4j schema: {', '.join(missing)}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Create the Neo4j constraints and indexes used by the sync scripts')
+    parser.add_argument('--check', action='store_true',
+                        help='Only report missing constraints/indexes, do not create them')
+    return parser.parse_args()
+
+def main():
+    load_environment()
+    args = parse_args()
+    driver = get_neo4j_driver()
+    try:
+        if args.check:
+            missing = find_missing_schema(driver)
+            if missing:
+                print("Missing constraints/indexes:")
+                for name in missing:
+                    print(f"- {name}")
+                sys.exit(1)
+            print("✓ All constraints and indexes exist")
+        else:
+            failed = ensure_schema(driver)
+            if failed:
+                sys.exit(1)
+    finally:
+        close_connections()
+
+if __name__ == "__main__":
+    main()
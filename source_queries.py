@@ -0,0 +1,61 @@
+import os
+import uuid
+
+###################################################
+#                    EXTRACTION                    #
+###################################################
+
+def pg_itersize():
+    """Rows pulled per network round trip by the server-side cursors (PG_ITERSIZE)."""
+    return int(os.getenv("PG_ITERSIZE", "2000"))
+
+# Columns each upsert_*_batch writer reads, per source table. Extraction
+# queries select only these instead of SELECT *.
+SOURCE_COLUMNS = {
+    'news_articles': [
+        'id', 'title', 'summary', 'full_content', 'date_posted', 'url', 'sentiment',
+        'city_seo', 'state_seo', 'topic_1', 'topic_2', 'topic_3', 'main_topic',
+        'topic_keywords', 'entity_person',
+    ],
+    'articles': [
+        'id', 'news_article_id', 'engagement_score', 'view_count', 'share_count',
+        'comment_count', 'reading_time_minutes', 'complexity_score', 'fact_density',
+        'is_opinion', 'sentiment_category',
+    ],
+    'council_meeting_articles': [
+        'id', 'article_title', 'article_content', 'summary', 'importance_score',
+        'video_id', 'related_insight_ids', 'topic_tags',
+    ],
+    'council_meeting_insights': [
+        'id', 'category', 'insight_title', 'insight_description', 'vote_result',
+        'next_steps', 'sentiment', 'importance', 'start_time', 'end_time',
+        'timestamp', 'city', 'created_at', 'video_id', 'quotes', 'entities',
+        'key_figures', 'related_topics',
+    ],
+    'council_meeting_videos': [
+        'id', 'youtube_url', 'meeting_title', 'meeting_date', 'video_duration',
+        'city', 'youtube_video_id', 'created_at',
+    ],
+}
+
+def projected_select(table, where, order_by, extra_columns=()):
+    """Build a SELECT of the table's SOURCE_COLUMNS (plus extra_columns) with the given filter and ordering."""
+    names = SOURCE_COLUMNS[table] + [c for c in extra_columns if c not in SOURCE_COLUMNS[table]]
+    columns = ", ".join(f'"{c}"' for c in names)
+    return f"SELECT {columns} FROM {table} WHERE {where} ORDER BY {order_by}"
+
+def stream_rows(pg_conn, query, params=None, itersize=None):
+    """
+    Run `query` on a named (server-side) cursor and yield rows as dicts.
+
+    Postgres plans the query once and the client only holds `itersize` rows
+    at a time, however large the result is.
+    """
+    with pg_conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+        cur.itersize = itersize or pg_itersize()
+        cur.execute(query, params)
+        colnames = None
+        for row in cur:
+            if colnames is None:
+                colnames = [desc[0] for desc in cur.description]
+            yield dict(zip(colnames, row))
@@ -0,0 +1,267 @@
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import asyncpg
+from connections import load_environment, postgres_url, open_async_neo4j_driver, get_neo4j_driver, close_connections
+from schema_setup import require_schema
+from checkpoint_store import ChangeDetector
+from sync_pipeline import SyncProgress, get_batch_sizer, TABLE_DEPENDENCIES
+from source_queries import SOURCE_COLUMNS, pg_itersize, projected_select
+from graph_writers import (
+    DIMENSIONS, ROW_ERRORS, FATAL_ERRORS, change_transform, prepare_checked, check_failures,
+    dead_letter_failures
+)
+from sync_to_neo4j import (
+    FULL_SYNC_TABLES,
+    FULL_SYNC_BATCH_SIZE,
+    get_last_processed_id,
+    save_checkpoint,
+    load_partition_plan,
+    id_expression,
+)
+
+###################################################
+#                 ASYNC POSTGRES                   #
+###################################################
+
+async def init_pg_connection(conn):
+    # Decode JSON columns to Python objects, as psycopg2 does
+    for json_type in ('json', 'jsonb'):
+        await conn.set_type_codec(json_type, encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+def record_to_row(record):
+    """asyncpg Record -> dict, with UUIDs as strings like psycopg2 returns them."""
+    return {k: str(v) if isinstance(v, uuid.UUID) else v for k, v in record.items()}
+
+async def read_batches(pg_pool, query, params, sizer):
+    """
+    Stream `query` through a server-side cursor in one read-only snapshot and
+    yield batches of rows sized by `sizer`.
+    """
+    async with pg_pool.acquire() as conn:
+        async with conn.transaction(isolation='repeatable_read', readonly=True):
+            batch = []
+            size = sizer.current()
+            async for record in conn.cursor(query, *params, prefetch=pg_itersize()):
+                batch.append(record_to_row(record))
+                if len(batch) >= size:
+                    yield batch
+                    batch = []
+                    size = sizer.current()
+            if batch:
+                yield batch
+
+###################################################
+#                   ASYNC WRITES                   #
+###################################################
+
+async def run_plan_async(tx, plan):
+    """Run a statement plan (see graph_writers.py) in an async transaction."""
+    try:
+        query, params = next(plan)
+        while True:
+            result = await tx.run(query, **params)
+            records = [record async for record in result]
+            query, params = plan.send(records)
+    except StopIteration as done:
+        return done.value
+
+async def write_batch_async(driver, upsert, rows, table, dimensions, sizer, prepared=None):
+    """
+    Async counterpart of graph_writers.write_batch: one managed transaction
+    per batch on its own session (with the params and payload size of
+    `prepared`, from prepare_rows, if given),
+    bisecting batches that fail with a row-level error and dead-lettering
+    the rows that still fail, unless they trip the FailureBreaker.
+    """
+    stats = {'calls': 0, 'attempts': 0}
+
+    async def work(tx, batch, params):
+        stats['attempts'] += 1
+        if params is None:
+            params = prepare_checked(upsert.prepare, batch)
+        return await run_plan_async(tx, upsert.statements(params, dimensions))
+
+    async def write(batch, params=None):
+        stats['calls'] += 1
+        try:
+            async with driver.session() as session:
+                ensured = await session.execute_write(work, batch, params)
+        except FATAL_ERRORS:
+            raise
+        except ROW_ERRORS as e:
+            if len(batch) == 1:
+                return [(batch[0], e)]
+            middle = len(batch) // 2
+            return await write(batch[:middle]) + await write(batch[middle:])
+        dimensions.add(ensured)
+        return []
+
+    params, payload_bytes = prepared if prepared is not None else (None, 0)
+    started = time.monotonic()
+    failed = await write(rows, params)
+    sizer.observe(len(rows), time.monotonic() - started,
+                  payload_bytes=payload_bytes,
+                  retries=stats['attempts'] - stats['calls'])
+    check_failures(table, rows, failed)
+    return dead_letter_failures(table, failed)
+
+class OrderedCheckpoint:
+    """
+    Batches of one table commit out of order; the checkpoint only moves to
+    the last id of the longest run of completed batches, so a restart never
+    skips a batch that was still in flight.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.next_seq = 0
+        self.completed = {}
+
+    def complete(self, seq, last_id):
+        self.completed[seq] = last_id
+        last = None
+        while self.next_seq in self.completed:
+            last = self.completed.pop(self.next_seq)
+            self.next_seq += 1
+        if last is not None:
+            save_checkpoint(self.name, last)
+
+###################################################
+#                   ASYNC SYNC                     #
+###################################################
+
+async def sync_table_async(pg_pool, driver, table, limiter, force=False):
+    """
+    Full sync of `table` from its checkpoint with up to `limiter` write
+    transactions in flight (shared by every table). Uses the same
+    checkpoints as sync_to_neo4j.py, so either can resume the other.
+    """
+    spec = FULL_SYNC_TABLES[table]
+    name = spec['checkpoint']
+    if load_partition_plan(name) is not None:
+        raise RuntimeError(f"{table} has an unfinished partitioned backfill, resume it with sync_to_neo4j.py")
+
+    last_id = get_last_processed_id(name, spec['uuid_ids'])
+    print(f"\nSyncing {table} after ID: {last_id}")
+
+    upsert = spec['upsert']
+    changes = ChangeDetector(table, SOURCE_COLUMNS[table], force=force)
+    transform = change_transform(changes, upsert)
+    sizer = get_batch_sizer(table, FULL_SYNC_BATCH_SIZE)
+    progress = SyncProgress(table)
+    checkpoint = OrderedCheckpoint(name)
+
+    async def write(seq, batch):
+        try:
+            # SQLite lookups and the transform stage run off the event loop
+            _, changed, prepared = await asyncio.to_thread(transform, batch)
+            if changed:
+                failed = await write_batch_async(driver, upsert, [row for row, _ in changed],
+                                                 table, DIMENSIONS, sizer, prepared)
+                await asyncio.to_thread(changes.record, changed, failed)
+            checkpoint.complete(seq, batch[-1]['id'])
+            progress.add(None, len(batch), batch[-1]['id'], skipped=len(batch) - len(changed))
+        finally:
+            limiter.release()
+
+    id_expr = id_expression(spec)
+    query = projected_select(table, f"{id_expr} > $1", id_expr)
+    in_flight = set()
+    errors = []
+
+    def finished(task):
+        in_flight.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            errors.append(task.exception())
+
+    try:
+        seq = 0
+        async for batch in read_batches(pg_pool, query, [last_id], sizer):
+            # Waiting for a free slot keeps the reader at most `limiter` batches ahead
+            await limiter.acquire()
+            if errors:
+                limiter.release()
+                raise errors[0]
+            task = asyncio.create_task(write(seq, batch))
+            in_flight.add(task)
+            task.add_done_callback(finished)
+            seq += 1
+        await asyncio.gather(*in_flight, return_exceptions=True)
+        if errors:
+            raise errors[0]
+    except BaseException:
+        for task in in_flight:
+            task.cancel()
+        await asyncio.gather(*in_flight, return_exceptions=True)
+        raise
+    print(progress.summary())
+
+async def run_async_sync(tables, concurrency, force=False):
+    """
+    Sync `tables` concurrently on one event loop. A table waits for the
+    tables it depends on (TABLE_DEPENDENCIES) and is skipped if one failed.
+    """
+    pg_pool = await asyncpg.create_pool(postgres_url(), min_size=1, max_size=len(tables),
+                                        init=init_pg_connection)
+    try:
+        driver = await open_async_neo4j_driver()
+    except Exception:
+        await pg_pool.close()
+        raise
+    limiter = asyncio.Semaphore(max(1, concurrency))
+    tasks = {}
+
+    async def run_table(table):
+        for dep in TABLE_DEPENDENCIES.get(table, []):
+            if dep in tasks:
+                try:
+                    await tasks[dep]
+                except Exception:
+                    raise RuntimeError(f"skipped because {dep} failed")
+        await sync_table_async(pg_pool, driver, table, limiter, force)
+
+    try:
+        for table in tables:
+            tasks[table] = asyncio.create_task(run_table(table))
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    finally:
+        await driver.close()
+        await pg_pool.close()
+
+    failed = {table: r for table, r in zip(tasks, results) if isinstance(r, Exception)}
+    for table, error in failed.items():
+        print(f"Error syncing {table}: {str(error)}")
+    if failed:
+        raise RuntimeError(f"Sync failed for: {', '.join(failed)}") from next(iter(failed.values()))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Full sync from Postgres to Neo4j on asyncio')
+    parser.add_argument('--tables', default=','.join(FULL_SYNC_TABLES),
+                        help='Comma-separated tables to sync (default: all)')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Neo4j write transactions in flight across all tables (default: 8)')
+    parser.add_argument('--force', action='store_true',
+                        help='Rewrite rows even if they are unchanged since the last sync')
+    return parser.parse_args()
+
+def main():
+    load_environment()
+    args = parse_args()
+    tables = [t.strip() for t in args.tables.split(',') if t.strip()]
+    unknown = [t for t in tables if t not in FULL_SYNC_TABLES]
+    if unknown:
+        raise SystemExit(f"Unknown tables: {', '.join(unknown)}")
+
+    try:
+        require_schema(get_neo4j_driver())
+    finally:
+        close_connections()
+
+    asyncio.run(run_async_sync(tables, args.concurrency, args.force))
+    print("\nAsync sync completed successfully! 🎉")
+
+if __name__ == "__main__":
+    main()
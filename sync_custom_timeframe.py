@@ -1,280 +1,153 @@
-import os
-import psycopg2
-from neo4j import GraphDatabase
-from dotenv import load_dotenv
-import sys
-from decimal import Decimal
-from datetime import datetime, timedelta
+from connections import (
+    load_environment, pg_connection, borrowed_connection, pg_pool_max, get_neo4j_driver, close_connections
+)
+from schema_setup import require_schema
+from checkpoint_store import get_checkpoint_store, ChangeDetector
+from source_queries import SOURCE_COLUMNS, projected_select, stream_rows
+from graph_writers import (
+    DIMENSIONS,
+    write_batch,
+    change_transform,
+    upsert_news_articles_batch,
+    upsert_articles_table_batch,
+    upsert_council_articles_batch,
+    upsert_council_insights_batch,
+    upsert_council_videos_batch
+)
+from sync_pipeline import get_batch_sizer, pipelined_batches, run_partitions, SyncProgress
+from datetime import datetime
 import argparse
-
-# Load environment variables
-load_dotenv()
-
-# Postgres connection parameters
-DATABASE_URL = f"postgresql://{os.getenv('user')}:{os.getenv('password')}@{os.getenv('host')}:{os.getenv('port')}/{os.getenv('dbname')}"
-
-# Neo4j credentials
-NEO4J_URI = os.getenv("NEO4J_URI")
-NEO4J_USER = os.getenv("NEO4J_USERNAME")
-NEO4J_PASS = os.getenv("NEO4J_PASSWORD")
-
-def get_pg_connection():
-    print("\nAttempting to connect to PostgreSQL database...")
-    try:
-        conn = psycopg2.connect(DATABASE_URL)
-        print("PostgreSQL connection successful!")
-        return conn
-    except Exception as e:
-        print(f"Error connecting to PostgreSQL: {str(e)}")
-        raise
-
-def get_neo4j_driver():
-    print("\nAttempting to connect to Neo4j database...")
-    try:
-        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASS))
-        with driver.session() as session:
-            result = session.run("RETURN 1 AS test")
-            result.single()
-        print("Neo4j connection successful!")
-        return driver
-    except Exception as e:
-        print(f"Error connecting to Neo4j: {str(e)}")
-        raise
-
-def sync_news_articles_timeframe(pg_conn, neo4j_driver, start_date, end_date):
-    """Sync news articles from a specific time frame"""
-    with pg_conn.cursor() as cur:
-        print(f"\nSyncing news_articles from {start_date} to {end_date}...")
-        cur.execute("""
+import functools
+
+def timeframe_checkpoint_prefix(table, start_date, end_date):
+    return f"timeframe:{table}:{start_date.isoformat()}:{end_date.isoformat()}:"
+
+def timeframe_checkpoint_name(table, start_date, end_date, partition, partitions):
+    # Slice bounds depend on the slice count, so a slice only resumes its own split
+    return f"{timeframe_checkpoint_prefix(table, start_date, end_date)}{partitions}:p{partition or 0}"
+
+def stream_timeframe(pg_conn, neo4j_driver, table, timestamp_column, upsert_batch,
+                     start_date, end_date, progress, checkpoint_name, partition=None,
+                     end_inclusive=True, force=False):
+    """
+    Stream one time slice of `table` into Neo4j in id order, checkpointing
+    after every committed batch so a repeated run of the same time frame
+    resumes where it stopped. Rows unchanged since they were last written
+    are skipped unless `force`.
+    """
+    store = get_checkpoint_store()
+    end_op = "<=" if end_inclusive else "<"
+    where = f"{timestamp_column} >= %s AND {timestamp_column} {end_op} %s"
+    params = [start_date, end_date]
+
+    last_id = store.get(checkpoint_name)
+    if last_id is not None:
+        print(f"[{table}] Resuming slice {partition or 0} after ID: {last_id}")
+        where += " AND id > %s"
+        params.append(last_id)
+
+    changes = ChangeDetector(table, SOURCE_COLUMNS[table], force=force)
+    rows = stream_rows(pg_conn, projected_select(table, where, "id"), params)
+
+    # Rows per Neo4j transaction, adapted per table from this starting size
+    sizer = get_batch_sizer(table, 50)
+    transform = change_transform(changes, upsert_batch)
+    with neo4j_driver.session() as session:
+        for batch, changed, prepared in pipelined_batches(rows, sizer.current, transform=transform):
+            if changed:
+                failed = write_batch(session, upsert_batch, [row for row, _ in changed], table,
+                                     DIMENSIONS, sizer, prepared)
+                changes.record(changed, failed)
+            last_id = batch[-1]['id']
+            store.set(checkpoint_name, last_id)
+            progress.add(partition, len(batch), last_id, skipped=len(batch) - len(changed))
+
+def split_timeframe(start_date, end_date, partitions):
+    """Split [start_date, end_date] into `partitions` equal, contiguous time slices."""
+    step = (end_date - start_date) / partitions
+    bounds = [start_date + step * k for k in range(partitions)] + [end_date]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def sync_table_timeframe(pg_conn, neo4j_driver, table, timestamp_column, upsert_batch,
+                         start_date, end_date, partitions=1, force=False):
+    """
+    Sync rows of `table` whose `timestamp_column` falls within the time frame,
+    streamed in id order through a server-side cursor. With partitions > 1 the
+    time frame is split into slices synced in parallel, each on its own
+    Postgres connection. Unchanged rows are skipped unless `force`. With
+    pg_conn None a pooled connection is borrowed only while needed, so the
+    slices do not wait behind one held for the whole run.
+    """
+    with borrowed_connection(pg_conn) as conn, conn.cursor() as cur:
+        print(f"\nSyncing {table} from {start_date} to {end_date}...")
+        cur.execute(f"""
             SELECT COUNT(*) 
-            FROM news_articles 
-            WHERE date >= %s AND date <= %s
+            FROM {table} 
+            WHERE {timestamp_column} >= %s AND {timestamp_column} <= %s
             """, (start_date, end_date))
         total_rows = cur.fetchone()[0]
         print(f"Found {total_rows} records to sync")
         
-        if total_rows == 0:
-            return
-        
-        # Process in batches
-        batch_size = 50
-        processed = 0
-        last_id = 0
-        
-        while processed < total_rows:
-            cur.execute("""
-                SELECT * 
-                FROM news_articles 
-                WHERE date >= %s AND date <= %s AND id > %s
-                ORDER BY id 
-                LIMIT %s
-                """, (start_date, end_date, last_id, batch_size))
-            rows = cur.fetchall()
-            if not rows:
-                break
-                
-            colnames = [desc[0] for desc in cur.description]
-
-            with neo4j_driver.session() as session:
-                for row in rows:
-                    data = dict(zip(colnames, row))
-                    last_id = data['id']
-                    session.execute_write(upsert_news_article, data)
-                    processed += 1
-                    if processed % 10 == 0:
-                        print(f"Progress: {processed}/{total_rows} records processed ({(processed/total_rows*100):.1f}%)")
-            
-            print(f"Completed batch: {processed}/{total_rows} records")
+    if total_rows == 0:
+        return
     
-    print("✓ Completed syncing news_articles")
+    progress = SyncProgress(table, total_rows)
+    if partitions <= 1:
+        with borrowed_connection(pg_conn) as conn:
+            stream_timeframe(conn, neo4j_driver, table, timestamp_column, upsert_batch,
+                             start_date, end_date, progress,
+                             timeframe_checkpoint_name(table, start_date, end_date, None, 1), force=force)
+    else:
+        slices = split_timeframe(start_date, end_date, partitions)
+        checkpoint_names = [timeframe_checkpoint_name(table, start_date, end_date, i, len(slices))
+                            for i in range(len(slices))]
+
+        def run_slice(i, slice_start, slice_end):
+            with pg_connection() as slice_conn:
+                stream_timeframe(slice_conn, neo4j_driver, table, timestamp_column, upsert_batch,
+                                 slice_start, slice_end, progress, checkpoint_names[i],
+                                 partition=i, end_inclusive=(i == len(slices) - 1), force=force)
+
+        # Slices beyond what the pool can serve wait for a thread, not a connection
+        parallel = min(len(slices), pg_pool_max())
+        if parallel < len(slices):
+            print(f"Running {parallel} of {len(slices)} slices at once (PG_POOL_MAX)")
+        run_partitions(
+            [functools.partial(run_slice, i, lo, hi) for i, (lo, hi) in enumerate(slices)],
+            workers=parallel
+        )
+        print(progress.summary())
+
+    # The whole time frame is done; a later run of it starts from scratch,
+    # including slices left behind by runs with another slice count
+    get_checkpoint_store().delete_prefix(timeframe_checkpoint_prefix(table, start_date, end_date))
+    
+    print(f"✓ Completed syncing {table}")
 
-def sync_articles_timeframe(pg_conn, neo4j_driver, start_date, end_date):
-    """Sync articles from a specific time frame"""
-    with pg_conn.cursor() as cur:
-        print(f"\nSyncing articles from {start_date} to {end_date}...")
-        cur.execute("""
-            SELECT COUNT(*) 
-            FROM articles 
-            WHERE processed_at >= %s AND processed_at <= %s
-            """, (start_date, end_date))
-        total_rows = cur.fetchone()[0]
-        print(f"Found {total_rows} records to sync")
-        
-        if total_rows == 0:
-            return
-        
-        # Process in batches
-        batch_size = 50
-        processed = 0
-        last_id = 0
-        
-        while processed < total_rows:
-            cur.execute("""
-                SELECT * 
-                FROM articles 
-                WHERE processed_at >= %s AND processed_at <= %s AND id > %s
-                ORDER BY id 
-                LIMIT %s
-                """, (start_date, end_date, last_id, batch_size))
-            rows = cur.fetchall()
-            if not rows:
-                break
-                
-            colnames = [desc[0] for desc in cur.description]
+def sync_news_articles_timeframe(pg_conn, neo4j_driver, start_date, end_date, partitions=1, force=False):
+    """Sync news articles from a specific time frame"""
+    sync_table_timeframe(pg_conn, neo4j_driver, 'news_articles', 'date',
+                         upsert_news_articles_batch, start_date, end_date, partitions, force)
 
-            with neo4j_driver.session() as session:
-                for row in rows:
-                    data = dict(zip(colnames, row))
-                    last_id = data['id']
-                    session.execute_write(upsert_articles_table, data)
-                    processed += 1
-                    if processed % 10 == 0:
-                        print(f"Progress: {processed}/{total_rows} records processed ({(processed/total_rows*100):.1f}%)")
-            
-            print(f"Completed batch: {processed}/{total_rows} records")
-    
-    print("✓ Completed syncing articles")
+def sync_articles_timeframe(pg_conn, neo4j_driver, start_date, end_date, partitions=1, force=False):
+    """Sync articles from a specific time frame"""
+    sync_table_timeframe(pg_conn, neo4j_driver, 'articles', 'processed_at',
+                         upsert_articles_table_batch, start_date, end_date, partitions, force)
 
-def sync_council_articles_timeframe(pg_conn, neo4j_driver, start_date, end_date):
+def sync_council_articles_timeframe(pg_conn, neo4j_driver, start_date, end_date, partitions=1, force=False):
     """Sync council meeting articles from a specific time frame"""
-    with pg_conn.cursor() as cur:
-        print(f"\nSyncing council_meeting_articles from {start_date} to {end_date}...")
-        cur.execute("""
-            SELECT COUNT(*) 
-            FROM council_meeting_articles 
-            WHERE created_at >= %s AND created_at <= %s
-            """, (start_date, end_date))
-        total_rows = cur.fetchone()[0]
-        print(f"Found {total_rows} records to sync")
-        
-        if total_rows == 0:
-            return
-        
-        # Process in batches
-        batch_size = 50
-        processed = 0
-        last_id = 0
-        
-        while processed < total_rows:
-            cur.execute("""
-                SELECT * 
-                FROM council_meeting_articles 
-                WHERE created_at >= %s AND created_at <= %s AND id > %s
-                ORDER BY id 
-                LIMIT %s
-                """, (start_date, end_date, last_id, batch_size))
-            rows = cur.fetchall()
-            if not rows:
-                break
-                
-            colnames = [desc[0] for desc in cur.description]
-
-            with neo4j_driver.session() as session:
-                for row in rows:
-                    data = dict(zip(colnames, row))
-                    last_id = data['id']
-                    session.execute_write(upsert_council_article, data)
-                    processed += 1
-                    if processed % 10 == 0:
-                        print(f"Progress: {processed}/{total_rows} records processed ({(processed/total_rows*100):.1f}%)")
-            
-            print(f"Completed batch: {processed}/{total_rows} records")
-    
-    print("✓ Completed syncing council_meeting_articles")
+    sync_table_timeframe(pg_conn, neo4j_driver, 'council_meeting_articles', 'created_at',
+                         upsert_council_articles_batch, start_date, end_date, partitions, force)
 
-def sync_council_insights_timeframe(pg_conn, neo4j_driver, start_date, end_date):
+def sync_council_insights_timeframe(pg_conn, neo4j_driver, start_date, end_date, partitions=1, force=False):
     """Sync council meeting insights from a specific time frame"""
-    with pg_conn.cursor() as cur:
-        print(f"\nSyncing council_meeting_insights from {start_date} to {end_date}...")
-        cur.execute("""
-            SELECT COUNT(*) 
-            FROM council_meeting_insights 
-            WHERE created_at >= %s AND created_at <= %s
-            """, (start_date, end_date))
-        total_rows = cur.fetchone()[0]
-        print(f"Found {total_rows} records to sync")
-        
-        if total_rows == 0:
-            return
-        
-        # Process in batches
-        batch_size = 50
-        processed = 0
-        last_id = 0
-        
-        while processed < total_rows:
-            cur.execute("""
-                SELECT * 
-                FROM council_meeting_insights 
-                WHERE created_at >= %s AND created_at <= %s AND id > %s
-                ORDER BY id 
-                LIMIT %s
-                """, (start_date, end_date, last_id, batch_size))
-            rows = cur.fetchall()
-            if not rows:
-                break
-                
-            colnames = [desc[0] for desc in cur.description]
-
-            with neo4j_driver.session() as session:
-                for row in rows:
-                    data = dict(zip(colnames, row))
-                    last_id = data['id']
-                    session.execute_write(upsert_council_insight, data)
-                    processed += 1
-                    if processed % 10 == 0:
-                        print(f"Progress: {processed}/{total_rows} records processed ({(processed/total_rows*100):.1f}%)")
-            
-            print(f"Completed batch: {processed}/{total_rows} records")
-    
-    print("✓ Completed syncing council_meeting_insights")
+    sync_table_timeframe(pg_conn, neo4j_driver, 'council_meeting_insights', 'created_at',
+                         upsert_council_insights_batch, start_date, end_date, partitions, force)
 
-def sync_council_videos_timeframe(pg_conn, neo4j_driver, start_date, end_date):
+def sync_council_videos_timeframe(pg_conn, neo4j_driver, start_date, end_date, partitions=1, force=False):
     """Sync council meeting videos from a specific time frame"""
-    with pg_conn.cursor() as cur:
-        print(f"\nSyncing council_meeting_videos from {start_date} to {end_date}...")
-        cur.execute("""
-            SELECT COUNT(*) 
-            FROM council_meeting_videos 
-            WHERE created_at >= %s AND created_at <= %s
-            """, (start_date, end_date))
-        total_rows = cur.fetchone()[0]
-        print(f"Found {total_rows} records to sync")
-        
-        if total_rows == 0:
-            return
-        
-        # Process in batches
-        batch_size = 50
-        processed = 0
-        last_id = 0
-        
-        while processed < total_rows:
-            cur.execute("""
-                SELECT * 
-                FROM council_meeting_videos 
-                WHERE created_at >= %s AND created_at <= %s AND id > %s
-                ORDER BY id 
-                LIMIT %s
-                """, (start_date, end_date, last_id, batch_size))
-            rows = cur.fetchall()
-            if not rows:
-                break
-                
-            colnames = [desc[0] for desc in cur.description]
-
-            with neo4j_driver.session() as session:
-                for row in rows:
-                    data = dict(zip(colnames, row))
-                    last_id = data['id']
-                    session.execute_write(upsert_council_video, data)
-                    processed += 1
-                    if processed % 10 == 0:
-                        print(f"Progress: {processed}/{total_rows} records processed ({(processed/total_rows*100):.1f}%)")
-            
-            print(f"Completed batch: {processed}/{total_rows} records")
-    
-    print("✓ Completed syncing council_meeting_videos")
+    sync_table_timeframe(pg_conn, neo4j_driver, 'council_meeting_videos', 'created_at',
+                         upsert_council_videos_batch, start_date, end_date, partitions, force)
 
 def parse_args():
     parser = argparse.ArgumentParser(description='Sync data within a specific time frame')
@@ -284,10 +157,15 @@ def parse_args():
     parser.add_argument('--table', choices=['all', 'news_articles', 'articles', 
                                            'council_articles', 'council_insights', 'council_videos'],
                        default='all', help='Which table to sync (default: all)')
+    parser.add_argument('--partitions', type=int, default=1,
+                        help='Split the time frame into N slices synced in parallel (default: 1)')
+    parser.add_argument('--force', action='store_true',
+                        help='Rewrite rows even if they are unchanged since the last sync')
     
     return parser.parse_args()
 
 def main():
+    load_environment()
     try:
         # Parse command-line arguments
         args = parse_args()
@@ -299,24 +177,25 @@ def main():
         print(f"Table selection: {args.table}")
         
         # Get connections
-        pg_conn = get_pg_connection()
         neo4j_driver = get_neo4j_driver()
+        require_schema(neo4j_driver)
 
-        # Sync selected tables for the time frame
+        # Sync selected tables for the time frame; each borrows pooled
+        # connections only while it needs them
         if args.table in ['all', 'news_articles']:
-            sync_news_articles_timeframe(pg_conn, neo4j_driver, start_date, end_date)
-            
+            sync_news_articles_timeframe(None, neo4j_driver, start_date, end_date, args.partitions, args.force)
+
         if args.table in ['all', 'articles']:
-            sync_articles_timeframe(pg_conn, neo4j_driver, start_date, end_date)
-            
+            sync_articles_timeframe(None, neo4j_driver, start_date, end_date, args.partitions, args.force)
+
         if args.table in ['all', 'council_articles']:
-            sync_council_articles_timeframe(pg_conn, neo4j_driver, start_date, end_date)
-            
+            sync_council_articles_timeframe(None, neo4j_driver, start_date, end_date, args.partitions, args.force)
+
         if args.table in ['all', 'council_insights']:
-            sync_council_insights_timeframe(pg_conn, neo4j_driver, start_date, end_date)
-            
+            sync_council_insights_timeframe(None, neo4j_driver, start_date, end_date, args.partitions, args.force)
+
         if args.table in ['all', 'council_videos']:
-            sync_council_videos_timeframe(pg_conn, neo4j_driver, start_date, end_date)
+            sync_council_videos_timeframe(None, neo4j_driver, start_date, end_date, args.partitions, args.force)
 
         print("\nTimeframe sync completed successfully! 🎉")
 
@@ -324,19 +203,7 @@ def main():
         print(f"Error during sync: {str(e)}")
         raise
     finally:
-        if 'pg_conn' in locals():
-            pg_conn.close()
-        if 'neo4j_driver' in locals():
-            neo4j_driver.close()
-
-# Import the upsert functions from the main sync script
-from sync_to_neo4j import (
-    upsert_news_article,
-    upsert_articles_table,
-    upsert_council_article,
-    upsert_council_insight,
-    upsert_council_video
-)
+        close_connections()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,277 +1,182 @@
 import os
 import psycopg2
-from neo4j import GraphDatabase
-from dotenv import load_dotenv
-import sys
-from decimal import Decimal
+from connections import load_environment, pg_connection, pg_pool_max, get_neo4j_driver, close_connections
+from schema_setup import require_schema
+from checkpoint_store import get_checkpoint_store, ChangeDetector
+from source_queries import SOURCE_COLUMNS, projected_select, stream_rows
+from graph_writers import (
+    DIMENSIONS,
+    write_batch,
+    change_transform,
+    upsert_news_articles_batch,
+    upsert_articles_table_batch,
+    upsert_council_articles_batch,
+    upsert_council_insights_batch,
+    upsert_council_videos_batch
+)
+from sync_pipeline import get_batch_sizer, pipelined_batches, run_table_syncs
 from datetime import datetime, timedelta
+import argparse
+import functools
+
+# Column each table's watermark follows. It must be set when a row is inserted
+# or updated: news_articles.date is the publish date, which can be older than
+# the watermark by the time the row arrives. Override per table with
+# DAILY_WATERMARK_COLUMN_<TABLE>.
+WATERMARK_COLUMNS = {
+    'news_articles': 'created_at',
+    'articles': 'processed_at',
+    'council_meeting_articles': 'created_at',
+    'council_meeting_insights': 'created_at',
+    'council_meeting_videos': 'created_at',
+}
+
+# Minutes re-read behind the watermark on every run (see sync_recent_table)
+DEFAULT_OVERLAP_MINUTES = 60
+
+def watermark_column(table):
+    return os.getenv(f"DAILY_WATERMARK_COLUMN_{table.upper()}", WATERMARK_COLUMNS[table])
+
+def parse_watermark(value):
+    """Watermark timestamp from the checkpoint store, which keeps it as text."""
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+def sync_recent_table(pg_conn, neo4j_driver, table, upsert_batch, cutoff_time, overlap):
+    """
+    Sync rows of `table` inserted or updated since its watermark.
+
+    The watermark is the highest watermark_column(table) value committed to
+    Neo4j by an earlier run; a table without one starts from cutoff_time.
+    Every run re-reads `overlap` behind the watermark, which picks up rows
+    whose transaction committed after an earlier run's snapshot with an
+    older timestamp. Re-read rows that did not change are skipped by the
+    ChangeDetector. The watermark advances after every committed batch.
+    """
+    timestamp_column = watermark_column(table)
+    store = get_checkpoint_store()
+    # Keyed by column, so changing a table's column starts a fresh watermark
+    watermark_name = f"daily:{table}:{timestamp_column}"
+    watermark = parse_watermark(store.get(watermark_name))
+
+    if watermark is None:
+        where = f"{timestamp_column} >= %s"
+        params = [cutoff_time]
+        print(f"\nSyncing {table} since {cutoff_time} (no watermark yet)...")
+    else:
+        where = f"{timestamp_column} > %s"
+        params = [watermark - overlap]
+        print(f"\nSyncing {table} after watermark {watermark} (re-reading {overlap})...")
 
-# Load environment variables
-load_dotenv()
-
-# Postgres connection parameters
-DATABASE_URL = f"postgresql://{os.getenv('user')}:{os.getenv('password')}@{os.getenv('host')}:{os.getenv('port')}/{os.getenv('dbname')}"
-
-# Neo4j credentials
-NEO4J_URI = os.getenv("NEO4J_URI")
-NEO4J_USER = os.getenv("NEO4J_USERNAME")
-NEO4J_PASS = os.getenv("NEO4J_PASSWORD")
-
-def get_pg_connection():
-    print("\nAttempting to connect to PostgreSQL database...")
-    try:
-        conn = psycopg2.connect(DATABASE_URL)
-        print("PostgreSQL connection successful!")
-        return conn
-    except Exception as e:
-        print(f"Error connecting to PostgreSQL: {str(e)}")
-        raise
-
-def get_neo4j_driver():
-    print("\nAttempting to connect to Neo4j database...")
-    try:
-        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASS))
-        with driver.session() as session:
-            result = session.run("RETURN 1 AS test")
-            result.single()
-        print("Neo4j connection successful!")
-        return driver
-    except Exception as e:
-        print(f"Error connecting to Neo4j: {str(e)}")
-        raise
-
-def sync_recent_news_articles(pg_conn, neo4j_driver, hours=24):
-    """Sync news articles from the last X hours"""
-    with pg_conn.cursor() as cur:
-        cutoff_time = datetime.now() - timedelta(hours=hours)
-        
-        print(f"\nSyncing news_articles from the last {hours} hours...")
-        cur.execute("""
-            SELECT COUNT(*) 
-            FROM news_articles 
-            WHERE date >= %s
-            """, (cutoff_time,))
-        total_rows = cur.fetchone()[0]
-        print(f"Found {total_rows} new records to sync")
-        
-        if total_rows == 0:
-            return
-        
-        # Process in batches
-        batch_size = 100
-        processed = 0
-        
-        while processed < total_rows:
-            cur.execute("""
-                SELECT * 
-                FROM news_articles 
-                WHERE date >= %s
-                ORDER BY id 
-                LIMIT %s OFFSET %s
-                """, (cutoff_time, batch_size, processed))
-            rows = cur.fetchall()
-            colnames = [desc[0] for desc in cur.description]
-
-            with neo4j_driver.session() as session:
-                for row in rows:
-                    data = dict(zip(colnames, row))
-                    session.execute_write(upsert_news_article, data)
-                    processed += 1
-                    if processed % 10 == 0:
-                        print(f"Progress: {processed}/{total_rows} records processed ({(processed/total_rows*100):.1f}%)")
-            
-            print(f"Completed batch: {processed}/{total_rows} records")
-    
-    print("✓ Completed syncing recent news_articles")
-
-def sync_recent_articles(pg_conn, neo4j_driver, hours=24):
-    """Sync articles from the last X hours"""
-    with pg_conn.cursor() as cur:
-        cutoff_time = datetime.now() - timedelta(hours=hours)
-        
-        print(f"\nSyncing articles from the last {hours} hours...")
-        cur.execute("""
-            SELECT COUNT(*) 
-            FROM articles 
-            WHERE processed_at >= %s
-            """, (cutoff_time,))
-        total_rows = cur.fetchone()[0]
-        print(f"Found {total_rows} new records to sync")
-        
-        if total_rows == 0:
-            return
-        
-        # Process in batches
-        batch_size = 100
-        processed = 0
-        
-        while processed < total_rows:
-            cur.execute("""
-                SELECT * 
-                FROM articles 
-                WHERE processed_at >= %s
-                ORDER BY id 
-                LIMIT %s OFFSET %s
-                """, (cutoff_time, batch_size, processed))
-            rows = cur.fetchall()
-            colnames = [desc[0] for desc in cur.description]
-
-            with neo4j_driver.session() as session:
-                for row in rows:
-                    data = dict(zip(colnames, row))
-                    session.execute_write(upsert_articles_table, data)
-                    processed += 1
-                    if processed % 10 == 0:
-                        print(f"Progress: {processed}/{total_rows} records processed ({(processed/total_rows*100):.1f}%)")
-            
-            print(f"Completed batch: {processed}/{total_rows} records")
-    
-    print("✓ Completed syncing recent articles")
-
-def sync_recent_council_articles(pg_conn, neo4j_driver, hours=24):
-    """Sync council meeting articles from the last X hours"""
     with pg_conn.cursor() as cur:
-        cutoff_time = datetime.now() - timedelta(hours=hours)
-        
-        print(f"\nSyncing council_meeting_articles from the last {hours} hours...")
-        cur.execute("""
+        cur.execute(f"""
             SELECT COUNT(*) 
-            FROM council_meeting_articles 
-            WHERE created_at >= %s
-            """, (cutoff_time,))
+            FROM {table} 
+            WHERE {where}
+            """, params)
         total_rows = cur.fetchone()[0]
         print(f"Found {total_rows} new records to sync")
         
-        if total_rows == 0:
-            return
-        
-        # Process in batches
-        batch_size = 100
-        processed = 0
-        
-        while processed < total_rows:
-            cur.execute("""
-                SELECT * 
-                FROM council_meeting_articles 
-                WHERE created_at >= %s
-                ORDER BY id 
-                LIMIT %s OFFSET %s
-                """, (cutoff_time, batch_size, processed))
-            rows = cur.fetchall()
-            colnames = [desc[0] for desc in cur.description]
-
-            with neo4j_driver.session() as session:
-                for row in rows:
-                    data = dict(zip(colnames, row))
-                    session.execute_write(upsert_council_article, data)
-                    processed += 1
-                    if processed % 10 == 0:
-                        print(f"Progress: {processed}/{total_rows} records processed ({(processed/total_rows*100):.1f}%)")
-            
-            print(f"Completed batch: {processed}/{total_rows} records")
+    if total_rows == 0:
+        return
     
-    print("✓ Completed syncing recent council_meeting_articles")
-
-def sync_recent_council_insights(pg_conn, neo4j_driver, hours=24):
-    """Sync council meeting insights from the last X hours"""
-    with pg_conn.cursor() as cur:
-        cutoff_time = datetime.now() - timedelta(hours=hours)
-        
-        print(f"\nSyncing council_meeting_insights from the last {hours} hours...")
-        cur.execute("""
-            SELECT COUNT(*) 
-            FROM council_meeting_insights 
-            WHERE created_at >= %s
-            """, (cutoff_time,))
-        total_rows = cur.fetchone()[0]
-        print(f"Found {total_rows} new records to sync")
-        
-        if total_rows == 0:
-            return
-        
-        # Process in batches
-        batch_size = 100
-        processed = 0
-        
-        while processed < total_rows:
-            cur.execute("""
-                SELECT * 
-                FROM council_meeting_insights 
-                WHERE created_at >= %s
-                ORDER BY id 
-                LIMIT %s OFFSET %s
-                """, (cutoff_time, batch_size, processed))
-            rows = cur.fetchall()
-            colnames = [desc[0] for desc in cur.description]
-
-            with neo4j_driver.session() as session:
-                for row in rows:
-                    data = dict(zip(colnames, row))
-                    session.execute_write(upsert_council_insight, data)
-                    processed += 1
-                    if processed % 10 == 0:
-                        print(f"Progress: {processed}/{total_rows} records processed ({(processed/total_rows*100):.1f}%)")
-            
-            print(f"Completed batch: {processed}/{total_rows} records")
+    # Rows per Neo4j transaction, adapted per table from this starting size
+    sizer = get_batch_sizer(table, 100)
+    processed = 0
     
-    print("✓ Completed syncing recent council_meeting_insights")
-
-def sync_recent_council_videos(pg_conn, neo4j_driver, hours=24):
-    """Sync council meeting videos from the last X hours"""
-    with pg_conn.cursor() as cur:
-        cutoff_time = datetime.now() - timedelta(hours=hours)
-        
-        print(f"\nSyncing council_meeting_videos from the last {hours} hours...")
-        cur.execute("""
-            SELECT COUNT(*) 
-            FROM council_meeting_videos 
-            WHERE created_at >= %s
-            """, (cutoff_time,))
-        total_rows = cur.fetchone()[0]
-        print(f"Found {total_rows} new records to sync")
-        
-        if total_rows == 0:
-            return
-        
-        # Process in batches
-        batch_size = 100
-        processed = 0
-        
-        while processed < total_rows:
-            cur.execute("""
-                SELECT * 
-                FROM council_meeting_videos 
-                WHERE created_at >= %s
-                ORDER BY id 
-                LIMIT %s OFFSET %s
-                """, (cutoff_time, batch_size, processed))
-            rows = cur.fetchall()
-            colnames = [desc[0] for desc in cur.description]
-
-            with neo4j_driver.session() as session:
-                for row in rows:
-                    data = dict(zip(colnames, row))
-                    session.execute_write(upsert_council_video, data)
-                    processed += 1
-                    if processed % 10 == 0:
-                        print(f"Progress: {processed}/{total_rows} records processed ({(processed/total_rows*100):.1f}%)")
+    changes = ChangeDetector(table, SOURCE_COLUMNS[table])
+    query = projected_select(table, where, f"{timestamp_column}, id", extra_columns=[timestamp_column])
+    rows = stream_rows(pg_conn, query, params)
+    transform = change_transform(changes, upsert_batch)
+    with neo4j_driver.session() as session:
+        for batch, changed, prepared in pipelined_batches(rows, sizer.current, transform=transform):
+            if changed:
+                failed = write_batch(session, upsert_batch, [row for row, _ in changed], table,
+                                     DIMENSIONS, sizer, prepared)
+                changes.record(changed, failed)
+            # Rows re-read in the overlap can be older than the stored watermark
+            if watermark is None or batch[-1][timestamp_column] > watermark:
+                watermark = batch[-1][timestamp_column]
+                store.set(watermark_name, watermark)
+            processed += len(batch)
             
-            print(f"Completed batch: {processed}/{total_rows} records")
+            print(f"[{table}] Completed batch: {processed}/{total_rows} records ({len(batch) - len(changed)} unchanged)")
     
-    print("✓ Completed syncing recent council_meeting_videos")
+    print(f"✓ Completed syncing recent {table}")
+
+def sync_recent_news_articles(pg_conn, neo4j_driver, cutoff_time, overlap):
+    """Sync news articles inserted since the last run"""
+    sync_recent_table(pg_conn, neo4j_driver, 'news_articles', upsert_news_articles_batch,
+                      cutoff_time, overlap)
+
+def sync_recent_articles(pg_conn, neo4j_driver, cutoff_time, overlap):
+    """Sync articles processed since the last run"""
+    sync_recent_table(pg_conn, neo4j_driver, 'articles', upsert_articles_table_batch,
+                      cutoff_time, overlap)
+
+def sync_recent_council_articles(pg_conn, neo4j_driver, cutoff_time, overlap):
+    """Sync council meeting articles created since the last run"""
+    sync_recent_table(pg_conn, neo4j_driver, 'council_meeting_articles', upsert_council_articles_batch,
+                      cutoff_time, overlap)
+
+def sync_recent_council_insights(pg_conn, neo4j_driver, cutoff_time, overlap):
+    """Sync council meeting insights created since the last run"""
+    sync_recent_table(pg_conn, neo4j_driver, 'council_meeting_insights', upsert_council_insights_batch,
+                      cutoff_time, overlap)
+
+def sync_recent_council_videos(pg_conn, neo4j_driver, cutoff_time, overlap):
+    """Sync council meeting videos created since the last run"""
+    sync_recent_table(pg_conn, neo4j_driver, 'council_meeting_videos', upsert_council_videos_batch,
+                      cutoff_time, overlap)
+
+def sync_with_snapshot(sync_fn, neo4j_driver, cutoff_time, overlap):
+    """
+    Run one table sync on a dedicated pooled Postgres connection that reads from a
+    single snapshot, so rows inserted mid-run are neither skipped nor
+    picked up twice.
+    """
+    with pg_connection() as pg_conn:
+        pg_conn.set_session(
+            isolation_level=psycopg2.extensions.ISOLATION_LEVEL_REPEATABLE_READ,
+            readonly=True
+        )
+        sync_fn(pg_conn, neo4j_driver, cutoff_time, overlap)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Sync rows added since the last run')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of tables to sync concurrently (default: 1)')
+    parser.add_argument('--lookback-hours', type=int, default=24,
+                        help='How far back to start for tables with no watermark yet (default: 24)')
+    parser.add_argument('--overlap-minutes', type=int,
+                        default=int(os.getenv("DAILY_SYNC_OVERLAP_MINUTES", DEFAULT_OVERLAP_MINUTES)),
+                        help=f'Minutes re-read behind each watermark (default: {DEFAULT_OVERLAP_MINUTES})')
+    return parser.parse_args()
 
 def main():
+    load_environment()
     try:
+        args = parse_args()
+
         # Get connections
-        pg_conn = get_pg_connection()
         neo4j_driver = get_neo4j_driver()
-
-        # Sync all tables for the last 24 hours
-        sync_recent_news_articles(pg_conn, neo4j_driver)
-        sync_recent_articles(pg_conn, neo4j_driver)
-        sync_recent_council_articles(pg_conn, neo4j_driver)
-        sync_recent_council_insights(pg_conn, neo4j_driver)
-        sync_recent_council_videos(pg_conn, neo4j_driver)
+        require_schema(neo4j_driver)
+
+        # Sync every table from its watermark
+        cutoff_time = datetime.now() - timedelta(hours=args.lookback_hours)
+        overlap = timedelta(minutes=args.overlap_minutes)
+        sync_functions = {
+            'news_articles': sync_recent_news_articles,
+            'articles': sync_recent_articles,
+            'council_meeting_articles': sync_recent_council_articles,
+            'council_meeting_videos': sync_recent_council_videos,
+            'council_meeting_insights': sync_recent_council_insights,
+        }
+        syncs = {
+            table: functools.partial(sync_with_snapshot, sync_fn, neo4j_driver, cutoff_time, overlap)
+            for table, sync_fn in sync_functions.items()
+        }
+        # One pooled connection per table being synced
+        run_table_syncs(syncs, workers=min(args.workers, pg_pool_max()))
 
         print("\nDaily sync completed successfully! 🎉")
 
@@ -279,19 +184,7 @@ def main():
         print(f"Error during sync: {str(e)}")
         raise
     finally:
-        if 'pg_conn' in locals():
-            pg_conn.close()
-        if 'neo4j_driver' in locals():
-            neo4j_driver.close()
-
-# Import the upsert functions
-from sync_to_neo4j import (
-    upsert_news_article,
-    upsert_articles_table,
-    upsert_council_article,
-    upsert_council_insight,
-    upsert_council_video
-)
+        close_connections()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,301 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Batches buffered between two stages (PIPELINE_QUEUE_SIZE, read per
+# pipeline). Bounds memory to a few batches in flight and makes a fast
+# reader wait for a slow writer (backpressure).
+DEFAULT_PIPELINE_QUEUE_SIZE = "4"
+
+# Marks the end of a stage's output
+_END = object()
+
+class _StageFailed:
+    """Carries an exception from a worker stage to the consuming thread."""
+    def __init__(self, error):
+        self.error = error
+
+def iter_batches(rows, batch_size):
+    """
+    Group an iterable of rows into lists of at most batch_size rows.
+    batch_size may be a callable (e.g. BatchSizer.current), read once per batch.
+    """
+    next_size = batch_size if callable(batch_size) else (lambda: batch_size)
+    size = next_size()
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+            size = next_size()
+    if batch:
+        yield batch
+
+def _put(q, item, stop):
+    """Put item on q, giving up if the pipeline is stopped. Returns False if stopped."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(q, stop):
+    """Get an item from q, returning _END if the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return _END
+
+def _read_stage(rows, batch_size, out_q, stop):
+    try:
+        for batch in iter_batches(rows, batch_size):
+            if not _put(out_q, batch, stop):
+                return
+        _put(out_q, _END, stop)
+    except Exception as e:
+        _put(out_q, _StageFailed(e), stop)
+    finally:
+        # Close generators (e.g. server-side cursors) on the thread using them
+        if hasattr(rows, 'close'):
+            rows.close()
+
+def _transform_stage(transform, in_q, out_q, stop):
+    while True:
+        item = _get(in_q, stop)
+        if item is _END or isinstance(item, _StageFailed):
+            _put(out_q, item, stop)
+            return
+        try:
+            result = transform(item)
+        except Exception as e:
+            _put(out_q, _StageFailed(e), stop)
+            return
+        if not _put(out_q, result, stop):
+            return
+
+def pipelined_batches(rows, batch_size, transform=None, queue_size=None):
+    """
+    Yield batches of `rows` while the next ones are read (and transformed)
+    in background threads.
+
+    reader thread -> [queue] -> transform thread -> [queue] -> caller
+
+    The caller's loop body is the writer stage, so Postgres reads overlap
+    with Neo4j writes. An exception in any stage is re-raised in the caller,
+    and leaving the loop early stops the background threads.
+    """
+    queue_size = queue_size or int(os.getenv("PIPELINE_QUEUE_SIZE", DEFAULT_PIPELINE_QUEUE_SIZE))
+    stop = threading.Event()
+    read_q = queue.Queue(maxsize=queue_size)
+    threads = [threading.Thread(target=_read_stage, args=(rows, batch_size, read_q, stop), daemon=True)]
+    out_q = read_q
+
+    if transform is not None:
+        out_q = queue.Queue(maxsize=queue_size)
+        threads.append(threading.Thread(target=_transform_stage, args=(transform, read_q, out_q, stop), daemon=True))
+
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = out_q.get()
+            if item is _END:
+                break
+            if isinstance(item, _StageFailed):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+###################################################
+#               ADAPTIVE BATCH SIZE                #
+###################################################
+
+# Settings (read when a BatchSizer is created). Each can be overridden for
+# one table, e.g. BATCH_SIZE_MAX_COUNCIL_MEETING_INSIGHTS=200.
+#   BATCH_SIZE_MIN / BATCH_SIZE_MAX  rows per transaction
+#   BATCH_TARGET_SECONDS             commit latency the controller steers towards
+#   BATCH_MAX_PAYLOAD_BYTES          upper bound on the parameters sent in one transaction
+
+def _table_setting(name, table, default, cast):
+    return cast(os.getenv(f"{name}_{table.upper()}", os.getenv(name, default)))
+
+class BatchSizer:
+    """
+    Per-table controller for the number of rows per Neo4j transaction.
+
+    After every committed batch `observe` is given its row count, commit
+    latency, parameter payload size and number of transient-error retries.
+    The size is halved after retries or a commit slower than 1.5x the
+    target, grows by a quarter while batches of at least half the size
+    commit in under half the target, and never exceeds what fits in
+    BATCH_MAX_PAYLOAD_BYTES at the observed bytes per row. Safe to share between the partitions of one table.
+    """
+
+    def __init__(self, table, initial):
+        self.table = table
+        self.min_size = _table_setting("BATCH_SIZE_MIN", table, "10", int)
+        self.max_size = _table_setting("BATCH_SIZE_MAX", table, "2000", int)
+        self.target_seconds = _table_setting("BATCH_TARGET_SECONDS", table, "2.0", float)
+        self.max_payload_bytes = _table_setting("BATCH_MAX_PAYLOAD_BYTES", table, str(4 * 1024 * 1024), int)
+        self.size = self._bounded(initial)
+        self._lock = threading.Lock()
+
+    def _bounded(self, size):
+        return max(self.min_size, min(self.max_size, int(size)))
+
+    def current(self):
+        with self._lock:
+            return self.size
+
+    def observe(self, rows, seconds, payload_bytes=0, retries=0):
+        """Adjust the batch size after a batch of `rows` rows committed in `seconds`."""
+        if rows <= 0:
+            return
+        with self._lock:
+            old = self.size
+            if retries:
+                new, reason = old / 2, f"{retries} transient retries"
+            elif seconds > self.target_seconds * 1.5:
+                new, reason = old / 2, f"commit took {seconds:.1f}s"
+            elif seconds < self.target_seconds / 2 and rows >= old / 2:
+                new, reason = old * 1.25 + 1, f"commit took {seconds:.1f}s"
+            else:
+                new, reason = old, None
+
+            if payload_bytes:
+                fits = self.max_payload_bytes * rows // payload_bytes
+                if new > fits:
+                    new, reason = fits, f"{payload_bytes // rows} bytes per row"
+
+            self.size = self._bounded(new)
+            if self.size != old:
+                print(f"[{self.table}] Batch size {old} -> {self.size} ({reason})")
+
+_sizers = {}
+_sizers_lock = threading.Lock()
+
+def get_batch_sizer(table, initial):
+    """Return the process-wide BatchSizer for `table`, creating it at `initial` rows."""
+    with _sizers_lock:
+        if table not in _sizers:
+            _sizers[table] = BatchSizer(table, initial)
+        return _sizers[table]
+
+###################################################
+#               PARALLEL TABLE SYNCS               #
+###################################################
+
+# Table syncs that must finish before another table's sync starts:
+# `articles` augments Article nodes created from `news_articles`, and
+# insights link to the Meeting nodes created from the videos.
+TABLE_DEPENDENCIES = {
+    'articles': ['news_articles'],
+    'council_meeting_insights': ['council_meeting_videos'],
+}
+
+def run_table_syncs(syncs, workers=1, dependencies=None):
+    """
+    Run independent table syncs concurrently on up to `workers` threads.
+
+    `syncs` maps table name -> zero-argument callable, in preferred start
+    order. A table starts only after the tables it depends on (among those
+    being synced) have completed; dependents of a failed table are skipped.
+    Raises after all runnable syncs finish if any of them failed.
+    """
+    if dependencies is None:
+        dependencies = TABLE_DEPENDENCIES
+    pending = list(syncs)
+    running = {}
+    done = set()
+    failed = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while pending or running:
+            for table in list(pending):
+                deps = [d for d in dependencies.get(table, []) if d in syncs]
+                failed_deps = [d for d in deps if d in failed]
+                if failed_deps:
+                    pending.remove(table)
+                    failed[table] = RuntimeError(f"skipped because {', '.join(failed_deps)} failed")
+                    print(f"Skipping {table}: {failed[table]}")
+                elif all(d in done for d in deps) and len(running) < max(1, workers):
+                    pending.remove(table)
+                    running[pool.submit(syncs[table])] = table
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                table = running.pop(future)
+                try:
+                    future.result()
+                    done.add(table)
+                except Exception as e:
+                    failed[table] = e
+                    print(f"Error syncing {table}: {str(e)}")
+
+    if failed:
+        first_error = next(iter(failed.values()))
+        raise RuntimeError(f"Sync failed for: {', '.join(failed)}") from first_error
+
+###################################################
+#              PARTITIONED SINGLE TABLE            #
+###################################################
+
+class SyncProgress:
+    """Thread-safe row counter that merges progress from several partitions into one report."""
+
+    def __init__(self, table, total_rows=None):
+        self.table = table
+        self.total_rows = total_rows
+        self.processed = 0
+        self.skipped = 0
+        self.by_partition = {}
+        self._lock = threading.Lock()
+
+    def add(self, partition, rows, position, skipped=0):
+        """Record `rows` more rows handled by `partition` (`skipped` of them unchanged), now at `position`."""
+        with self._lock:
+            self.processed += rows
+            self.skipped += skipped
+            self.by_partition[partition] = self.by_partition.get(partition, 0) + rows
+            if self.total_rows:
+                overall = f"{self.processed}/{self.total_rows} records ({self.processed / self.total_rows * 100:.1f}%)"
+            else:
+                overall = f"{self.processed} records processed"
+            where = f"Last ID: {position}" if partition is None else f"Partition {partition} at: {position}"
+            print(f"[{self.table}] Completed batch. Progress: {overall}, {self.skipped} unchanged. {where}")
+
+    def summary(self):
+        with self._lock:
+            summary = f"[{self.table}] {self.processed} records processed, {self.skipped} unchanged"
+            parts = ", ".join(f"partition {p}: {n}" for p, n in self.by_partition.items() if p is not None)
+            return f"{summary} ({parts})" if parts else summary
+
+def run_partitions(tasks, workers):
+    """
+    Run zero-argument partition callables on up to `workers` threads.
+
+    Every partition runs to completion (or failure) before raising, so the
+    partitions that did succeed keep their checkpoints. Returns the results
+    in task order.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(task) for task in tasks]
+        wait(futures)
+
+    errors = [f.exception() for f in futures if f.exception() is not None]
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {len(tasks)} partitions failed") from errors[0]
+    return [f.result() for f in futures]
@@ -0,0 +1,554 @@
+import os
+import datetime
+import functools
+import threading
+from collections import Counter
+from neo4j import READ_ACCESS
+from checkpoint_store import get_checkpoint_store
+from sync_pipeline import run_partitions
+
+###################################################
+#                  TREND LEVELS                    #
+###################################################
+
+# Trend nodes kept per (city, topic, period). Each level: node label, period
+# property, City relationship and the strftime format of the period key,
+# the same "YYYY-WXX" / "YYYY-MM" keys the aggregators are run with. Daily
+# buckets are the base layer the weekly and monthly trends roll up from;
+# they are not linked to their City.
+TREND_LEVELS = {
+    'daily': {
+        'label': 'TopicTrendDaily',
+        'key': 'day',
+        'rel': None,
+        'format': '%Y-%m-%d',
+    },
+    'weekly': {
+        'label': 'TopicTrendWeekly',
+        'key': 'yearWeek',
+        'rel': 'WEEKLY_TREND',
+        'format': '%Y-W%W',
+    },
+    'monthly': {
+        'label': 'TopicTrend',
+        'key': 'yearMonth',
+        'rel': 'MONTHLY_TREND',
+        'format': '%Y-%m',
+    },
+}
+
+# Levels rolled up from the daily buckets
+ROLLUP_LEVELS = ['weekly', 'monthly']
+
+def to_date(value):
+    """Python date of a publish date read from Postgres or Neo4j, or None."""
+    if value is None:
+        return None
+    if hasattr(value, 'to_native'):
+        value = value.to_native()
+    if isinstance(value, str):
+        value = datetime.date.fromisoformat(value[:10])
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return value
+
+def trend_period(level, date):
+    """Period key of `date` at `level`, e.g. "2024-W07" or "2024-02"."""
+    if level == 'weekly':
+        # Weeks are keyed by their Monday, so a week spanning Jan 1 keeps
+        # all seven days under the key get_week_dates() gives it
+        date = date - datetime.timedelta(days=date.weekday())
+    return date.strftime(TREND_LEVELS[level]['format'])
+
+def period_bounds(level, date):
+    """[start, end) dates of the `level` period containing `date`."""
+    if level == 'weekly':
+        start = date - datetime.timedelta(days=date.weekday())
+        return start, start + datetime.timedelta(weeks=1)
+    if level == 'monthly':
+        start = date.replace(day=1)
+        return start, (start + datetime.timedelta(days=32)).replace(day=1)
+    return date, date + datetime.timedelta(days=1)
+
+###################################################
+#               PARTIAL AGGREGATES                 #
+###################################################
+
+# Trend nodes carry mergeable partials next to the published values:
+#   mentionCount    HAS_TOPIC edges in the period
+#   sentimentCount  of those, articles with a sentiment score
+#   sentimentSum    sum of their scores
+#   sentimentSumSq  sum of their squared scores
+# The sync writer adds the deltas of the edges it creates (or whose article
+# was re-scored) at every level, so trends stay current without rescanning
+# articles. The aggregators re-derive a period from its daily buckets and
+# finalize it; only days the writer did not cover are rebuilt from articles.
+
+# Checkpoint-store key holding the day the sync started maintaining daily
+# buckets; later days are complete without a rebuild
+BUCKETS_SINCE = "trends:buckets_since"
+
+_partials_marked = False
+_marker_lock = threading.Lock()
+
+def mark_partials_started():
+    """Record BUCKETS_SINCE on the first trend write, once per process."""
+    global _partials_marked
+    with _marker_lock:
+        if not _partials_marked:
+            store = get_checkpoint_store()
+            if store.get(BUCKETS_SINCE) is None:
+                store.set(BUCKETS_SINCE, datetime.date.today().isoformat())
+            _partials_marked = True
+
+def trend_delta(topic_row, date, sentiment, is_new, previous=None):
+    """
+    Partial-aggregate delta of one HAS_TOPIC edge: a new edge adds its
+    article's sentiment, an existing one swaps `previous` for `sentiment`.
+    """
+    delta = {
+        'city': topic_row['city'],
+        'state': topic_row['state'],
+        'topic': topic_row['topic'],
+        'date': to_date(date),
+        'count': 1 if is_new else 0,
+        'scored': 0,
+        'sum': 0.0,
+        'sum_sq': 0.0,
+    }
+    for score, sign in ((sentiment, 1), (None if is_new else previous, -1)):
+        if score is not None:
+            score = float(score)
+            delta['scored'] += sign
+            delta['sum'] += sign * score
+            delta['sum_sq'] += sign * score * score
+    return delta
+
+def aggregate_trend_deltas(deltas):
+    """
+    Collapse edge deltas into one row per trend node and City at every
+    level: {level: rows}. Sorted by node key so concurrent writers lock
+    trend nodes in the same order.
+    """
+    by_level = {}
+    for level in TREND_LEVELS:
+        rows = {}
+        for d in deltas:
+            if d['date'] is None:
+                continue
+            period = trend_period(level, d['date'])
+            key = (d['topic'], d['city'], period, d['state'])
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = {
+                    'topic': d['topic'], 'city': d['city'], 'state': d['state'], 'period': period,
+                    'count': 0, 'scored': 0, 'sum': 0.0, 'sum_sq': 0.0, 'rollup': {}
+                }
+                if level == 'daily':
+                    # Buckets record the periods they roll up into
+                    row['rollup'] = {TREND_LEVELS[parent]['key']: trend_period(parent, d['date'])
+                                     for parent in ROLLUP_LEVELS}
+            for field in ('count', 'scored', 'sum', 'sum_sq'):
+                row[field] += d[field]
+        by_level[level] = [rows[key] for key in sorted(rows)]
+    return by_level
+
+def trend_delta_statements(deltas):
+    """Statement plan adding `deltas` (see trend_delta) to the trend nodes of every level."""
+    mark_partials_started()
+    for level, rows in aggregate_trend_deltas(deltas).items():
+        if not rows:
+            continue
+        spec = TREND_LEVELS[level]
+        link = ""
+        if spec['rel']:
+            link = f"""
+            WITH tt, row
+            MATCH (c:City {{name: row.city, state: row.state}})
+            MATCH (i:Issue {{name: row.topic}})
+            MERGE (c)-[:{spec['rel']}]->(tt)
+            MERGE (tt)-[:TREND_OF]->(i)
+            """
+        else:
+            # Buckets remember the states of their cities so finalization
+            # links the trends to the right City nodes
+            link = """
+            SET tt.cityStates = CASE
+                    WHEN row.state IS NULL OR row.state IN coalesce(tt.cityStates, []) THEN tt.cityStates
+                    ELSE coalesce(tt.cityStates, []) + row.state END
+            """
+        # Additions on a node without partials stay NULL until the rollup sets them
+        yield (
+            f"""
+            UNWIND $rows AS row
+            MERGE (tt:{spec['label']} {{topicName: row.topic, cityName: row.city, {spec['key']}: row.period}})
+            ON CREATE SET
+                tt += row.rollup,
+                tt.mentionCount = 0,
+                tt.sentimentCount = 0,
+                tt.sentimentSum = 0.0,
+                tt.sentimentSumSq = 0.0
+            SET tt.mentionCount = coalesce(tt.mentionCount, 0) + row.count,
+                tt.sentimentCount = tt.sentimentCount + row.scored,
+                tt.sentimentSum = tt.sentimentSum + row.sum,
+                tt.sentimentSumSq = tt.sentimentSumSq + row.sum_sq,
+                tt.lastUpdated = datetime()
+            SET tt.averageSentiment = CASE
+                    WHEN tt.sentimentSum IS NULL THEN tt.averageSentiment
+                    WHEN tt.sentimentCount > 0 THEN tt.sentimentSum / tt.sentimentCount
+                    ELSE NULL END
+            {link}
+            """,
+            {'rows': rows}
+        )
+
+###################################################
+#                  FINALIZATION                    #
+###################################################
+
+def trend_write_batch():
+    """Trend nodes per write transaction (TREND_WRITE_BATCH)."""
+    return int(os.getenv("TREND_WRITE_BATCH", "1000"))
+
+def trend_fetch_size():
+    """Records per pull when streaming aggregates back from Neo4j (TREND_FETCH_SIZE)."""
+    return int(os.getenv("TREND_FETCH_SIZE", "1000"))
+
+def read_session(driver):
+    """Session for the aggregate reads, routed to a reader on a cluster or Aura."""
+    return driver.session(default_access_mode=READ_ACCESS, fetch_size=trend_fetch_size())
+
+# With several workers, cities are split into this many groups per worker
+# so a worker that drew small cities picks up another group
+PARTITIONS_PER_WORKER = 4
+
+def partition_cities(cities, workers):
+    """Split city names round-robin into up to workers * PARTITIONS_PER_WORKER groups."""
+    cities = sorted(cities)
+    count = min(len(cities), workers * PARTITIONS_PER_WORKER)
+    return [cities[i::count] for i in range(count)]
+
+def run_city_partitions(task, cities, workers):
+    """
+    Run task(cities) for every group of `cities` on up to `workers` threads.
+    Trend nodes and buckets are keyed by city name, so the groups never
+    write the same node. Returns the results in group order.
+    """
+    tasks = [functools.partial(task, group) for group in partition_cities(cities, workers)]
+    return run_partitions(tasks, workers)
+
+def city_filter(cities, name, clause="AND"):
+    """Cypher condition limiting `name` to $cities, or none when cities is None."""
+    return "" if cities is None else f"{clause} {name} IN $cities"
+
+def delete_in_batches(session, query, **params):
+    """
+    Run a `query` that deletes up to $limit matched nodes and returns their
+    count, one write transaction per trend_write_batch() nodes, until
+    nothing is left. Returns the number deleted.
+    """
+    limit = trend_write_batch()
+    deleted = 0
+    while True:
+        count = session.execute_write(
+            lambda tx: tx.run(query, limit=limit, **params).single()['deleted'])
+        deleted += count
+        if count < limit:
+            return deleted
+
+def period_days(level, period, start_date, end_date):
+    """Days in [start_date, end_date) whose `level` period is `period`."""
+    days = [start_date + datetime.timedelta(days=n) for n in range((end_date - start_date).days)]
+    return [day for day in days if trend_period(level, day) == period]
+
+def days_to_rebuild(days, force=False):
+    """
+    The `days` whose buckets may miss articles: those before the sync
+    maintained buckets and not rebuilt since (all of them with `force`).
+    """
+    if force:
+        return list(days)
+    store = get_checkpoint_store()
+    since = store.get(BUCKETS_SINCE)
+    return [day for day in days
+            if (since is None or str(day) <= since)
+            and not store.get(f"trends:daily:{day}:rebuilt")]
+
+def rebuild_daily_buckets(driver, days, workers=1):
+    """
+    Recompute the daily buckets of `days` from the HAS_TOPIC edges published
+    on them, in one scan of their date range (one per city group with
+    several `workers`), writing TREND_WRITE_BATCH buckets per transaction.
+    Returns the number of buckets written.
+    """
+    if not days:
+        return 0
+    if workers > 1:
+        with read_session(driver) as session:
+            cities = [record['city'] for record in session.run("MATCH (c:City) RETURN DISTINCT c.name AS city")]
+        rebuilt = sum(run_city_partitions(
+            functools.partial(rebuild_city_buckets, driver, days), cities, workers))
+    else:
+        rebuilt = rebuild_city_buckets(driver, days)
+
+    store = get_checkpoint_store()
+    for day in days:
+        store.set(f"trends:daily:{day}:rebuilt", True)
+    return rebuilt
+
+def rebuild_city_buckets(driver, days, cities=None):
+    """Rebuild the buckets of `days` for `cities` (all when None); see rebuild_daily_buckets."""
+    spec = TREND_LEVELS['daily']
+    wanted = {str(day) for day in days}
+    with read_session(driver) as reader, driver.session() as writer:
+        # Buckets of (topic, city) pairs that no longer have articles on a
+        # day would otherwise survive the rebuild
+        delete_in_batches(writer, f"""
+            MATCH (d:{spec['label']})
+            WHERE d.{spec['key']} IN $days
+              {city_filter(cities, 'd.cityName')}
+            WITH d LIMIT $limit
+            DETACH DELETE d
+            RETURN count(*) AS deleted
+            """, days=sorted(wanted), cities=cities)
+        result = reader.run(
+            f"""
+            MATCH (c:City)<-[:PUBLISHED_IN]-(a:Article)-[rel:HAS_TOPIC]->(i:Issue)
+            WHERE rel.publishDate >= date($startDate)
+              AND rel.publishDate < date($endDate)
+              {city_filter(cities, 'c.name')}
+            RETURN c.name AS city, c.state AS state, i.name AS topic, rel.publishDate AS date,
+                   count(a) AS count,
+                   count(a.sentimentScore) AS scored,
+                   sum(a.sentimentScore) AS total,
+                   sum(a.sentimentScore * a.sentimentScore) AS total_sq
+            """,
+            startDate=str(min(days)), endDate=str(max(days) + datetime.timedelta(days=1)),
+            cities=cities
+        )
+        buckets = {}
+        for record in result:
+            date = to_date(record['date'])
+            if date is None or str(date) not in wanted:
+                continue
+            day = trend_period('daily', date)
+            bucket = buckets.get((record['topic'], record['city'], day))
+            if bucket is None:
+                bucket = buckets[(record['topic'], record['city'], day)] = {
+                    'topic': record['topic'], 'city': record['city'], 'period': day,
+                    'rollup': {TREND_LEVELS[parent]['key']: trend_period(parent, date)
+                               for parent in ROLLUP_LEVELS},
+                    'count': 0, 'scored': 0, 'sum': 0.0, 'sum_sq': 0.0, 'states': []
+                }
+            if record['state'] is not None and record['state'] not in bucket['states']:
+                bucket['states'].append(record['state'])
+            bucket['count'] += record['count']
+            bucket['scored'] += record['scored']
+            bucket['sum'] += float(record['total'] or 0)
+            bucket['sum_sq'] += float(record['total_sq'] or 0)
+        rows = [buckets[key] for key in sorted(buckets)]
+
+        batch_size = trend_write_batch()
+        for i in range(0, len(rows), batch_size):
+            writer.execute_write(lambda tx, batch: tx.run(
+                f"""
+                UNWIND $rows AS row
+                MERGE (tt:{spec['label']} {{topicName: row.topic, cityName: row.city, {spec['key']}: row.period}})
+                SET tt += row.rollup,
+                    tt.cityStates = row.states,
+                    tt.mentionCount = row.count,
+                    tt.sentimentCount = row.scored,
+                    tt.sentimentSum = row.sum,
+                    tt.sentimentSumSq = row.sum_sq,
+                    tt.averageSentiment = CASE WHEN row.scored > 0 THEN row.sum / row.scored END,
+                    tt.lastUpdated = datetime()
+                """,
+                rows=batch
+            ).consume(), rows[i:i + batch_size])
+    return len(rows)
+
+def trend_row(record):
+    """
+    Trend write parameters from the summed daily buckets of one (city, topic),
+    with the states of the cities its articles were published in.
+    """
+    scored = record['scored']
+    mean = variance = None
+    if scored:
+        mean = record['total'] / scored
+        variance = record['totalSq'] / scored - mean * mean
+    return {
+        'topic': record['topic'],
+        'city': record['city'],
+        'states': sorted({state for states in record['stateLists'] for state in states or []}),
+        'count': record['mentions'],
+        'scored': scored,
+        'sum': record['total'],
+        'sum_sq': record['totalSq'],
+        'mean': mean,
+        'stddev': None if variance is None else max(variance, 0.0) ** 0.5,
+    }
+
+def write_trends(session, level, period, rows):
+    """Set the partials and published values of a batch of `period` trends."""
+    spec = TREND_LEVELS[level]
+    session.execute_write(lambda tx: tx.run(
+        f"""
+        UNWIND $rows AS row
+        MERGE (tt:{spec['label']} {{topicName: row.topic, cityName: row.city, {spec['key']}: $period}})
+        SET tt.mentionCount = row.count,
+            tt.sentimentCount = row.scored,
+            tt.sentimentSum = row.sum,
+            tt.sentimentSumSq = row.sum_sq,
+            tt.averageSentiment = row.mean,
+            tt.sentimentStdDev = row.stddev,
+            tt.finalizedAt = datetime(),
+            tt.lastUpdated = datetime()
+        WITH tt, row
+        CALL {{
+            WITH tt, row
+            MATCH (i:Issue {{name: row.topic}})
+            MERGE (tt)-[:TREND_OF]->(i)
+        }}
+        CALL {{
+            WITH tt, row
+            UNWIND row.states AS state
+            MATCH (c:City {{name: row.city, state: state}})
+            MERGE (c)-[:{spec['rel']}]->(tt)
+        }}
+        """,
+        rows=rows, period=period
+    ).consume())
+
+def drop_stale_trends(session, level, period, cities=None):
+    """
+    Delete the `period` trends of `cities` (all when None) that no daily
+    bucket backs any more, e.g. after a rebuild. Returns the number deleted.
+    """
+    spec = TREND_LEVELS[level]
+    daily = TREND_LEVELS['daily']
+    return delete_in_batches(session, f"""
+        MATCH (tt:{spec['label']} {{{spec['key']}: $period}})
+        WHERE NOT EXISTS {{
+            MATCH (:{daily['label']} {{topicName: tt.topicName, cityName: tt.cityName, {spec['key']}: $period}})
+        }}
+          {city_filter(cities, 'tt.cityName')}
+        WITH tt LIMIT $limit
+        DETACH DELETE tt
+        RETURN count(*) AS deleted
+        """, period=period, cities=cities)
+
+def new_summary():
+    return {'trends': 0, 'dropped': 0, 'mentions': 0, 'scored': 0, 'sum': 0.0, 'topics': Counter()}
+
+def merge_summaries(summaries):
+    total = new_summary()
+    for summary in summaries:
+        for field in ('trends', 'dropped', 'mentions', 'scored', 'sum'):
+            total[field] += summary[field]
+        total['topics'].update(summary['topics'])
+    return total
+
+def finalize_trends(driver, level, period, workers=1):
+    """
+    Derive every trend of `period` by combining its daily buckets, publish
+    mentionCount, averageSentiment and sentimentStdDev and mark it
+    finalized; trends left without buckets are deleted. With several
+    `workers` the cities of the period are split into groups finalized in
+    parallel. Returns a summary (see format_summary).
+    """
+    if workers <= 1:
+        return finalize_city_trends(driver, level, period)
+    spec = TREND_LEVELS[level]
+    with read_session(driver) as session:
+        # Cities with trends but no buckets left still need their trends dropped
+        cities = [record['city'] for record in session.run(
+            f"MATCH (d:{TREND_LEVELS['daily']['label']} {{{spec['key']}: $period}}) "
+            "RETURN DISTINCT d.cityName AS city "
+            "UNION "
+            f"MATCH (tt:{spec['label']} {{{spec['key']}: $period}}) "
+            "RETURN DISTINCT tt.cityName AS city",
+            period=period
+        )]
+    return merge_summaries(run_city_partitions(
+        functools.partial(finalize_city_trends, driver, level, period), cities, workers))
+
+def finalize_city_trends(driver, level, period, cities=None):
+    """
+    Finalize the `period` trends of `cities` (all when None). The
+    per-(city, topic) sums are streamed from a read query TREND_FETCH_SIZE
+    records at a time and written TREND_WRITE_BATCH trends per transaction.
+    """
+    spec = TREND_LEVELS[level]
+    daily = TREND_LEVELS['daily']
+    summary = new_summary()
+    batch_size = trend_write_batch()
+
+    with read_session(driver) as reader, driver.session() as writer:
+        result = reader.run(
+            f"""
+            MATCH (d:{daily['label']} {{{spec['key']}: $period}})
+            {city_filter(cities, 'd.cityName', "WHERE")}
+            RETURN d.topicName AS topic, d.cityName AS city,
+                   sum(d.mentionCount) AS mentions,
+                   sum(d.sentimentCount) AS scored,
+                   sum(d.sentimentSum) AS total,
+                   sum(d.sentimentSumSq) AS totalSq,
+                   collect(d.cityStates) AS stateLists
+            ORDER BY topic, city
+            """,
+            period=period, cities=cities
+        )
+        batch = []
+        for record in result:
+            row = trend_row(record)
+            batch.append(row)
+            summary['trends'] += 1
+            summary['mentions'] += row['count']
+            summary['scored'] += row['scored']
+            summary['sum'] += row['sum']
+            summary['topics'][row['topic']] += row['count']
+            if len(batch) >= batch_size:
+                write_trends(writer, level, period, batch)
+                batch = []
+        if batch:
+            write_trends(writer, level, period, batch)
+        summary['dropped'] = drop_stale_trends(writer, level, period, cities)
+    return summary
+
+def format_summary(summary, top=5):
+    """One-line summary of finalize_trends: counts, mean sentiment and top topics."""
+    mean = summary['sum'] / summary['scored'] if summary['scored'] else None
+    topics = ", ".join(f"{topic} ({count})" for topic, count in summary['topics'].most_common(top))
+    line = (f"{summary['trends']} topic trends, {summary['mentions']} mentions, "
+            f"AvgSent={format_sentiment(mean)}")
+    if summary['dropped']:
+        line += f", {summary['dropped']} stale trends dropped"
+    return f"{line}; top topics: {topics}" if topics else line
+
+def backfill_trends(driver, level, start_date, end_date, rebuild=False, workers=1):
+    """
+    Finalize every `level` period overlapping [start_date, end_date). The
+    daily buckets of all their days that need it are rebuilt in a single
+    pass first. Returns [(period, summary)] in date order.
+    """
+    first, _ = period_bounds(level, start_date)
+    _, last = period_bounds(level, end_date - datetime.timedelta(days=1))
+    days = [first + datetime.timedelta(days=n) for n in range((last - first).days)]
+
+    stale = days_to_rebuild(days, force=rebuild)
+    if stale:
+        print(f"Rebuilding {len(stale)} days of daily buckets from their articles")
+        rebuilt = rebuild_daily_buckets(driver, stale, workers)
+        print(f"Rebuilt {rebuilt} daily buckets")
+
+    periods = []
+    for day in days:
+        if day >= start_date and day < end_date:
+            period = trend_period(level, day)
+            if period not in periods:
+                periods.append(period)
+    return [(period, finalize_trends(driver, level, period, workers)) for period in periods]
+
+def format_sentiment(value):
+    return "n/a" if value is None else f"{value:.2f}"